@@ -23,9 +23,9 @@ from src.go_tfidf import GOTFIDF
 from src.permanence import calculate_permanence_all_proteins
 from src.membership_overlap import apply_overlap_reassignment
 from src.lea.optimize import optimize_communities
-from src.evaluation import evaluate_clusters
+from src.evaluation import evaluate_clusters_df
 from src.outputs import (
-    save_initial_clusters, save_go_term_importance,
+    precompute_membership, save_initial_clusters, save_go_term_importance,
     save_protein_membership, save_optimized_clusters,
     save_overlap_summary, save_evaluation_results
 )
@@ -85,6 +85,12 @@ def main():
                        help='LEA population size')
     parser.add_argument('--lea-evaluations', type=int, default=500,
                        help='LEA maximum function evaluations')
+    parser.add_argument('--lea-workers', type=int, default=1,
+                       help='Number of processes for parallel LEA fitness evaluation')
+    parser.add_argument('--overlap-workers', type=int, default=1,
+                       help='Number of processes for scoring overlap candidates')
+    parser.add_argument('--permanence-workers', type=int, default=1,
+                       help='Number of processes for permanence calculation')
     parser.add_argument('--lambda-inter', type=float, default=1.0,
                        help='Weight for inter-cluster penalty')
     parser.add_argument('--lambda-fragment', type=float, default=0.5,
@@ -195,7 +201,8 @@ def main():
     
     # Step 5: Calculate permanence
     logger.info("\n[Step 5] Calculating permanence...")
-    permanence_scores = calculate_permanence_all_proteins(initial_clusters, graph)
+    permanence_scores = calculate_permanence_all_proteins(initial_clusters, graph,
+                                                          n_workers=args.permanence_workers)
     
     # Step 6: Calculate membership and apply overlap (initial)
     logger.info("\n[Step 6] Applying initial overlap reassignment...")
@@ -208,10 +215,20 @@ def main():
         permanence_scores,
         alpha=args.alpha,
         overlap_tau=args.overlap_tau,
-        transfer_tau=args.transfer_tau
+        transfer_tau=args.transfer_tau,
+        n_workers=args.overlap_workers
     )
     
-    # Save protein membership
+    # Save protein membership (memberships are reused for the optimized
+    # clusters output when LEA is skipped)
+    memberships = precompute_membership(
+        clusters_with_overlap,
+        graph,
+        protein_go_terms,
+        go_tfidf,
+        permanence_scores,
+        args.alpha
+    )
     save_protein_membership(
         clusters_with_overlap,
         graph,
@@ -219,7 +236,8 @@ def main():
         go_tfidf,
         permanence_scores,
         args.alpha,
-        os.path.join(args.outdir, 'protein_membership.csv')
+        os.path.join(args.outdir, 'protein_membership.csv'),
+        memberships=memberships
     )
     
     # Step 7: LEA optimization
@@ -235,7 +253,8 @@ def main():
             max_evaluations=args.lea_evaluations,
             lambda_inter=args.lambda_inter,
             lambda_fragment=args.lambda_fragment,
-            random_seed=args.random_seed
+            random_seed=args.random_seed,
+            n_workers=args.lea_workers
         )
         
         optimized_alpha = best_solution[0]
@@ -252,7 +271,8 @@ def main():
         go_tfidf,
         graph,
         optimized_alpha,
-        os.path.join(args.outdir, 'clusters_optimized_lea.csv')
+        os.path.join(args.outdir, 'clusters_optimized_lea.csv'),
+        memberships=memberships if args.skip_lea else None
     )
     
     # Save overlap summary
@@ -277,7 +297,7 @@ def main():
                 gold_standard[cid] = set()
             gold_standard[cid].add(pid)
     
-    evaluation_df = evaluate_clusters(
+    evaluation_df = evaluate_clusters_df(
         optimized_clusters,
         graph,
         protein_go_terms,
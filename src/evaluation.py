@@ -26,11 +26,17 @@ def calculate_intra_density(cluster: Set[str], graph: nx.Graph) -> float:
     if len(cluster) < 2:
         return 0.0
     
+    # Probe the adjacency dict directly; graph.has_edge adds a method call
+    # and exception handling per pair
+    adj = graph._adj
     cluster_list = list(cluster)
     edges = 0
     for i, p1 in enumerate(cluster_list):
+        nbrs = adj.get(p1)
+        if nbrs is None:
+            continue
         for p2 in cluster_list[i+1:]:
-            if graph.has_edge(p1, p2):
+            if p2 in nbrs:
                 edges += 1
     
     max_possible = len(cluster) * (len(cluster) - 1) / 2
@@ -90,7 +96,7 @@ def calculate_conductance(cluster: Set[str], graph: nx.Graph) -> float:
     for protein in cluster:
         neighbors = set(graph.neighbors(protein))
         cluster_volume += len(neighbors)
-        cut_size += len(neighbors - cluster)
+        cut_size += len(neighbors) - len(neighbors & cluster)
     
     rest_volume = graph.number_of_edges() * 2 - cluster_volume
     
@@ -197,10 +203,13 @@ def evaluate_clusters(clusters: Dict[int, Set[str]],
                      graph: nx.Graph,
                      protein_go_terms: Dict[str, Set[str]],
                      go_tfidf,
-                     gold_standard: Optional[Dict[int, Set[str]]] = None) -> pd.DataFrame:
+                     gold_standard: Optional[Dict[int, Set[str]]] = None) -> Dict[str, float]:
     """
     Evaluate clusters using multiple metrics.
     
+    Returns a plain dict so that sweeps can collect one row per call and
+    build a single DataFrame at the end (see evaluate_clusters_df).
+    
     Args:
         clusters: Dict mapping cluster_id to set of proteins
         graph: NetworkX graph
@@ -209,7 +218,7 @@ def evaluate_clusters(clusters: Dict[int, Set[str]],
         gold_standard: Optional gold standard clusters for comparison
         
     Returns:
-        DataFrame with evaluation metrics
+        Dict mapping metric name to value
     """
     logger.info("Evaluating clusters...")
     
@@ -264,6 +273,29 @@ def evaluate_clusters(clusters: Dict[int, Set[str]],
         nmi = calculate_overlapping_nmi(clusters, gold_standard)
         metrics['overlapping_nmi'] = nmi
     
+    return metrics
+
+
+def evaluate_clusters_df(clusters: Dict[int, Set[str]],
+                         graph: nx.Graph,
+                         protein_go_terms: Dict[str, Set[str]],
+                         go_tfidf,
+                         gold_standard: Optional[Dict[int, Set[str]]] = None) -> pd.DataFrame:
+    """
+    Evaluate clusters and return the metrics as a single-row DataFrame.
+    
+    Args:
+        clusters: Dict mapping cluster_id to set of proteins
+        graph: NetworkX graph
+        protein_go_terms: Dict mapping protein ID to GO terms
+        go_tfidf: GOTFIDF instance
+        gold_standard: Optional gold standard clusters for comparison
+        
+    Returns:
+        DataFrame with evaluation metrics
+    """
+    metrics = evaluate_clusters(clusters, graph, protein_go_terms, go_tfidf,
+                                gold_standard=gold_standard)
     return pd.DataFrame([metrics])
 
 
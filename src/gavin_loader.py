@@ -3,6 +3,7 @@ Gavin PPI network loader.
 Parses weighted socio-affinity PPI networks.
 """
 
+import sys
 import logging
 import networkx as nx
 from typing import Tuple
@@ -54,8 +55,9 @@ class GavinLoader:
             for line in f:
                 parts = line.strip().split('\t')
                 if len(parts) >= 3:
-                    protein1 = parts[0].strip()
-                    protein2 = parts[1].strip()
+                    # Interned, so every adjacency entry shares the node's string
+                    protein1 = sys.intern(parts[0].strip())
+                    protein2 = sys.intern(parts[1].strip())
                     
                     # Try to parse weight - handle various formats
                     try:
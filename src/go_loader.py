@@ -3,14 +3,75 @@ GO (Gene Ontology) annotation loader.
 Parses GOA GAF files and maps to proteins.
 """
 
+import io
 import os
+import sys
+import csv
 import gzip
 import logging
 from typing import Dict, Set, List, Optional
-from collections import defaultdict
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+_EMPTY = frozenset()
+
+# GAF 2.x files have 17 tab-separated columns
+GAF_NUM_COLUMNS = 17
+
+# Read buffer for GAF files; the 8 KiB default means many small reads
+# into zlib for large .gaf.gz files
+GAF_READ_BUFFER_SIZE = 128 * 1024
+
+
+def _open_gaf(gaf_file: str) -> io.BufferedReader:
+    """
+    Open a (possibly gzipped) GAF file for binary reading with a large read buffer.
+    
+    Args:
+        gaf_file: Path to GAF file (can be .gz)
+        
+    Returns:
+        Binary file object
+    """
+    if gaf_file.endswith('.gz'):
+        raw = gzip.GzipFile(gaf_file, 'rb')
+    else:
+        raw = open(gaf_file, 'rb', buffering=0)
+    return io.BufferedReader(raw, buffer_size=GAF_READ_BUFFER_SIZE)
+
+
+def _read_gaf_columns(gaf_file: str) -> pd.DataFrame:
+    """
+    Read the first GAF_NUM_COLUMNS fields of every line of a GAF file.
+    
+    Shorter lines are padded with empty strings and fields past
+    GAF_NUM_COLUMNS (e.g. a trailing tab) are ignored, so no line is skipped
+    or shifted. Bytes are decoded as UTF-8, replacing invalid sequences.
+    
+    Args:
+        gaf_file: Path to GAF file (can be .gz)
+    
+    Returns:
+        DataFrame of strings with columns 0..GAF_NUM_COLUMNS-1
+    """
+    options = dict(
+        sep='\t', header=None, names=range(GAF_NUM_COLUMNS), index_col=False,
+        dtype=str, keep_default_na=False, quoting=csv.QUOTE_NONE,
+        on_bad_lines='skip', engine='c',
+        encoding='utf-8', encoding_errors='replace'
+    )
+    try:
+        # Parsed as one block, usecols only fails when no line of the file
+        # has GAF_NUM_COLUMNS fields
+        with _open_gaf(gaf_file) as f:
+            return pd.read_csv(f, usecols=range(GAF_NUM_COLUMNS), low_memory=False, **options)
+    except pd.errors.ParserError:
+        # Every line is shorter than GAF_NUM_COLUMNS (e.g. GAF 1.0), so
+        # none is too long and all are padded
+        with _open_gaf(gaf_file) as f:
+            return pd.read_csv(f, **options)
+
 
 class GOLoader:
     """
@@ -41,97 +102,47 @@ class GOLoader:
         Returns:
             protein_go_terms: Dict mapping protein ID to set of GO term IDs
         """
-        protein_go_terms = defaultdict(set)
-        
         logger.info(f"Loading GO annotations from {gaf_file}...")
         if use_symbol:
             logger.info("Using DB_Object_Symbol for protein IDs (SGD format)")
         
-        # Try different encodings
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        open_func = None
-        
-        for encoding in encodings:
-            try:
-                if gaf_file.endswith('.gz'):
-                    test_func = lambda f, e=encoding: gzip.open(f, 'rt', encoding=e)
-                else:
-                    test_func = lambda f, e=encoding: open(f, 'r', encoding=e, errors='replace')
-                
-                with test_func(gaf_file) as f:
-                    # Test read
-                    test_line = f.readline()
-                    if test_line:
-                        # Success - set open_func
-                        if gaf_file.endswith('.gz'):
-                            open_func = lambda f, e=encoding: gzip.open(f, 'rt', encoding=e)
-                        else:
-                            open_func = lambda f, e=encoding: open(f, 'r', encoding=e, errors='replace')
-                        break
-            except (UnicodeDecodeError, AttributeError, TypeError, IOError) as e:
-                logger.debug(f"Encoding {encoding} failed: {e}")
-                continue
-        
-        if open_func is None:
-            # Fallback: use errors='replace'
-            logger.warning("Using fallback encoding (utf-8 with error replacement)")
-            if gaf_file.endswith('.gz'):
-                open_func = lambda f: gzip.open(f, 'rt', encoding='utf-8', errors='replace')
-            else:
-                open_func = lambda f: open(f, 'r', encoding='utf-8', errors='replace')
+        # GAF format fields (0-based columns)
+        # Column 0: DB
+        # Column 1: DB_Object_ID
+        # Column 2: DB_Object_Symbol (e.g., YDL159W for SGD)
+        # Column 3: Qualifier
+        # Column 4: GO_ID
+        # Column 12: Taxon (GAF 2.1), may list several as taxon:A|taxon:B
+        protein_col = 2 if use_symbol else 1
         
         try:
-            with open_func(gaf_file) as f:
-                for line in f:
-                    if line.startswith('!'):
-                        continue  # Skip comment lines
-                    
-                    parts = line.strip().split('\t')
-                    if len(parts) < 5:
-                        continue
-                    
-                    # GAF format fields
-                    # Column 0: DB
-                    # Column 1: DB_Object_ID
-                    # Column 2: DB_Object_Symbol (e.g., YDL159W for SGD)
-                    # Column 3: Qualifier
-                    # Column 4: GO_ID
-                    
-                    if use_symbol:
-                        protein_id = parts[2] if len(parts) > 2 else parts[1]  # Use symbol (SGD format)
-                    else:
-                        protein_id = parts[1]  # Use DB_Object_ID (GOA format)
-                    
-                    qualifier = parts[3] if len(parts) > 3 else ""
-                    go_id = parts[4] if len(parts) > 4 else None
-                    
-                    if not go_id or not go_id.startswith('GO:'):
-                        continue
-                    
-                    # Get taxon_id if available (usually column 12 in GAF 2.1)
-                    taxon_id = None
-                    if len(parts) > 12:
-                        taxon_id = parts[12]
-                    
-                    # Filter by taxid if provided
-                    if taxid is not None:
-                        if taxon_id:
-                            taxon_parts = taxon_id.split('|')
-                            if not any(str(taxid) in tp for tp in taxon_parts):
-                                continue
-                        else:
-                            # If taxid filtering requested but no taxon_id found, skip
-                            continue
-                    
-                    # Only include 'NOT' excluded terms and valid evidence codes
-                    if qualifier == 'NOT':
-                        continue
-                    
-                    # Filter by evidence code (optional - include all for now)
-                    # Common codes: EXP, IDA, IPI, IMP, IGI, IEP, HTP, HDA, HMP, HGI, HEP, IBA, IBD, IKR, IRD, ISS, ISO, ISA, ISM, IGC, RCA, TAS, IC, ND
-                    
-                    if protein_id and go_id:
-                        protein_go_terms[protein_id].add(go_id)
+            # Parse the whole file with the C reader instead of splitting
+            # every line in Python; filtering is done with vectorized masks
+            gaf = _read_gaf_columns(gaf_file)
+            gaf = gaf[[0, 1, 2, 3, 4, 12]]
+            
+            # Skip comment lines
+            gaf = gaf[~gaf[0].str.startswith('!')]
+            
+            mask = gaf[4].str.startswith('GO:') & (gaf[protein_col] != '')
+            
+            # Exclude 'NOT' annotations
+            # Evidence codes are not filtered (include all for now)
+            mask &= gaf[3] != 'NOT'
+            
+            # Filter by taxid if provided (rows without a taxon are skipped)
+            if taxid is not None:
+                mask &= gaf[12].str.contains(str(taxid), regex=False)
+            
+            gaf = gaf[mask]
+            
+            # One interned string object per distinct protein ID and GO term,
+            # shared with the graph's (interned) node names
+            for col in (protein_col, 4):
+                codes, uniques = pd.factorize(gaf[col])
+                interned = pd.Index([sys.intern(value) for value in uniques], dtype=object)
+                gaf[col] = interned.take(codes) if len(codes) else gaf[col]
+            protein_go_terms = gaf.groupby(protein_col, sort=False)[4].agg(set).to_dict()
         except IOError as e:
             logger.error(f"Error reading GO file {gaf_file}: {e}")
             raise
@@ -146,7 +157,8 @@ class GOLoader:
             logger.warning(f"  3. use_symbol={use_symbol} matches file format")
         
         logger.info(f"Loaded GO annotations for {len(protein_go_terms)} proteins")
-        return dict(protein_go_terms)
+        
+        return protein_go_terms
     
     def get_go_terms_for_cluster(self, cluster_proteins: Set[str], 
                                   protein_go_terms: Dict[str, Set[str]]) -> Set[str]:
@@ -160,9 +172,9 @@ class GOLoader:
         Returns:
             Set of GO term IDs
         """
-        cluster_go_terms = set()
-        for protein in cluster_proteins:
-            if protein in protein_go_terms:
-                cluster_go_terms.update(protein_go_terms[protein])
-        return cluster_go_terms
+        # Iterate whichever side is smaller and probe the other
+        if len(cluster_proteins) > len(protein_go_terms):
+            return set().union(*(go_terms for protein, go_terms in protein_go_terms.items()
+                                 if protein in cluster_proteins))
+        return set().union(*(protein_go_terms.get(protein, _EMPTY) for protein in cluster_proteins))
 
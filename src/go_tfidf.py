@@ -5,8 +5,8 @@ Implements Eq.3 from main.docx.
 
 import logging
 from typing import Dict, Set, List
-from collections import defaultdict
-import math
+import numpy as np
+import scipy.sparse as sp
 
 logger = logging.getLogger(__name__)
 
@@ -37,41 +37,83 @@ class GOTFIDF:
         # Term frequency (TF): frequency of GO term in cluster
         # Document frequency (DF): number of clusters containing the term
         # IDF = log(N / DF) where N is total number of clusters
+        #
+        # Counts are held in a sparse (clusters x GO terms) matrix so that DF,
+        # IDF and the TF-IDF product are computed with array operations.
         
-        self.tf = defaultdict(lambda: defaultdict(int))  # cluster_id -> go_term -> count
-        self.df = defaultdict(int)  # go_term -> number of clusters containing it
-        
-        # Count term frequencies per cluster
-        for cluster_id, proteins in self.clusters.items():
-            cluster_go_terms = set()
-            for protein in proteins:
-                if protein in self.protein_go_terms:
-                    for go_term in self.protein_go_terms[protein]:
-                        self.tf[cluster_id][go_term] += 1
-                        cluster_go_terms.add(go_term)
-            
-            # Update document frequency
-            for go_term in cluster_go_terms:
-                self.df[go_term] += 1
+        self.cluster_ids = list(self.clusters)
+        self.cluster_index = {cid: i for i, cid in enumerate(self.cluster_ids)}
+        self.term_index = {}  # go_term -> column
+        
+        term_index = self.term_index
+        protein_cols = {}  # protein -> list of term columns (built once per protein)
+        cols = []
+        row_lengths = np.zeros(self.num_clusters, dtype=np.int64)
+        
+        # Collect one (cluster, term) entry per annotated protein in the cluster
+        for row, cluster_id in enumerate(self.cluster_ids):
+            start = len(cols)
+            for protein in self.clusters[cluster_id]:
+                protein_terms = protein_cols.get(protein)
+                if protein_terms is None:
+                    go_terms = self.protein_go_terms.get(protein)
+                    if go_terms is None:
+                        continue
+                    protein_terms = [term_index.setdefault(go_term, len(term_index))
+                                     for go_term in go_terms]
+                    protein_cols[protein] = protein_terms
+                cols.extend(protein_terms)
+            row_lengths[row] = len(cols) - start
+        
+        self.terms = np.array(list(term_index), dtype=object)
+        shape = (self.num_clusters, len(self.terms))
+        rows = np.repeat(np.arange(self.num_clusters), row_lengths)
+        
+        # Duplicate (cluster, term) entries are summed into counts
+        self.tf_matrix = sp.csr_matrix(
+            (np.ones(len(cols), dtype=np.int32), (rows, np.asarray(cols, dtype=np.int64))),
+            shape=shape
+        )
+        self.tf_matrix.sort_indices()
+        
+        # Every stored count is positive, so DF is the number of entries per column
+        self.df = np.bincount(self.tf_matrix.indices, minlength=shape[1])
+        # IDF for all terms in one vectorized log (DF >= 1 for every indexed term)
+        self.idf = np.log(self.num_clusters / np.maximum(self.df, 1))
+        
+        # TF-IDF (Eq.3) with TF normalized by cluster size. Built on the same
+        # sparsity structure as the counts so terms with IDF 0 are kept.
+        cluster_sizes = np.array([len(self.clusters[cid]) for cid in self.cluster_ids],
+                                 dtype=np.float64)
+        entry_rows = np.repeat(np.arange(self.num_clusters), np.diff(self.tf_matrix.indptr))
+        tfidf = (self.tf_matrix.data / cluster_sizes[entry_rows]) * self.idf[self.tf_matrix.indices]
+        self.tfidf_matrix = sp.csr_matrix(
+            (tfidf, self.tf_matrix.indices, self.tf_matrix.indptr), shape=shape
+        )
         
-        # Compute TF-IDF scores
-        self.tfidf_scores = defaultdict(lambda: defaultdict(float))
+        # cluster_id -> {go_term: score}, filled lazily from the matrix rows
+        self._cluster_scores = {}
+    
+    def _get_cluster_scores(self, cluster_id: int) -> Dict[str, float]:
+        """
+        Get the TF-IDF scores of all GO terms present in a cluster.
         
-        for cluster_id in self.clusters:
-            cluster_size = len(self.clusters[cluster_id])
-            if cluster_size == 0:
-                continue
+        Args:
+            cluster_id: Cluster ID
             
-            for go_term, tf_count in self.tf[cluster_id].items():
-                # TF: normalized frequency in cluster
-                tf = tf_count / cluster_size
-                
-                # IDF: inverse document frequency
-                df = self.df[go_term]
-                idf = math.log(self.num_clusters / df) if df > 0 else 0
-                
-                # TF-IDF score (Eq.3)
-                self.tfidf_scores[cluster_id][go_term] = tf * idf
+        Returns:
+            Dict mapping go_term to TF-IDF score (empty if cluster is unknown)
+        """
+        scores = self._cluster_scores.get(cluster_id)
+        if scores is None:
+            row = self.cluster_index.get(cluster_id)
+            if row is None:
+                return {}
+            start, end = self.tfidf_matrix.indptr[row], self.tfidf_matrix.indptr[row + 1]
+            scores = dict(zip(self.terms[self.tfidf_matrix.indices[start:end]].tolist(),
+                              self.tfidf_matrix.data[start:end].tolist()))
+            self._cluster_scores[cluster_id] = scores
+        return scores
     
     def get_tfidf(self, cluster_id: int, go_term: str) -> float:
         """
@@ -84,7 +126,7 @@ class GOTFIDF:
         Returns:
             TF-IDF score
         """
-        return self.tfidf_scores.get(cluster_id, {}).get(go_term, 0.0)
+        return self._get_cluster_scores(cluster_id).get(go_term, 0.0)
     
     def get_top_terms(self, cluster_id: int, top_k: int = 10) -> List[tuple]:
         """
@@ -97,12 +139,25 @@ class GOTFIDF:
         Returns:
             List of (go_term, tfidf_score) tuples, sorted by score descending
         """
-        if cluster_id not in self.tfidf_scores:
+        row = self.cluster_index.get(cluster_id)
+        if row is None or top_k <= 0:
             return []
+        start, end = self.tfidf_matrix.indptr[row], self.tfidf_matrix.indptr[row + 1]
+        scores = self.tfidf_matrix.data[start:end]
+        
+        if top_k < len(scores):
+            # Partial selection of the top-k; ties at the cut-off keep the
+            # earliest terms, as a stable full sort would
+            kth = -np.partition(-scores, top_k - 1)[top_k - 1]
+            above = np.flatnonzero(scores > kth)
+            tied = np.flatnonzero(scores == kth)[:top_k - len(above)]
+            idx = np.concatenate([above, tied])
+        else:
+            idx = np.arange(len(scores))
+        idx = idx[np.lexsort((idx, -scores[idx]))]
         
-        terms_scores = list(self.tfidf_scores[cluster_id].items())
-        terms_scores.sort(key=lambda x: x[1], reverse=True)
-        return terms_scores[:top_k]
+        terms = self.terms[self.tfidf_matrix.indices[start + idx]].tolist()
+        return list(zip(terms, scores[idx].tolist()))
     
     def get_all_scores(self) -> Dict[int, Dict[str, float]]:
         """
@@ -111,5 +166,7 @@ class GOTFIDF:
         Returns:
             Dict mapping cluster_id to dict of go_term -> tfidf_score
         """
-        return dict(self.tfidf_scores)
+        return {cluster_id: self._get_cluster_scores(cluster_id)
+                for row, cluster_id in enumerate(self.cluster_ids)
+                if self.tfidf_matrix.indptr[row + 1] > self.tfidf_matrix.indptr[row]}
 
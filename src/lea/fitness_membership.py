@@ -4,12 +4,24 @@ Maximizes community quality metrics while minimizing fragmentation.
 """
 
 import logging
+import functools
 from typing import Dict, Set, Callable
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
+
+from src.membership_overlap import (
+    FunctionalDependencyMatrix, apply_overlap_reassignment, build_neighbor_sets,
+    combine_membership
+)
+from src.permanence import get_permanence
 
 logger = logging.getLogger(__name__)
 
+# Fitness memoization: solutions are rounded to this many decimals
+FITNESS_CACHE_DECIMALS = 3
+FITNESS_CACHE_SIZE = 4096
+
 
 class MembershipFitness:
     """
@@ -37,8 +49,88 @@ class MembershipFitness:
         self.go_tfidf = go_tfidf
         self.permanence_scores = permanence_scores
         
-        # Cache for performance
+        # Cache for performance: (protein, cluster_id) -> (perm_norm, fd_norm).
+        # Valid for the lifetime of this object since its inputs are fixed.
         self._membership_cache = {}
+        
+        # Integer index over all graph nodes and clustered proteins, shared by
+        # the adjacency and GO matrices below
+        proteins = dict.fromkeys(self.graph.nodes())
+        for cluster in self.initial_clusters.values():
+            proteins.update(dict.fromkeys(cluster))
+        self.protein_index = {p: i for i, p in enumerate(proteins)}
+        
+        # CSR adjacency used for intra/inter edge counts
+        self._build_adjacency()
+        
+        # Normalized FD of every protein for every cluster, shared by the GO
+        # coherence term and the overlap reassignment of each evaluation
+        self.fd_matrix = FunctionalDependencyMatrix(self.protein_index, protein_go_terms, go_tfidf)
+        self.neighbor_sets = build_neighbor_sets(graph)
+        # Alpha-independent overlap reassignment inputs, filled on first use
+        self._reassignment_cache = {}
+    
+    def _build_adjacency(self):
+        """
+        Build an unweighted CSR adjacency matrix indexed by protein_index.
+        
+        Proteins that are clustered but not in the graph get empty rows.
+        """
+        n = len(self.protein_index)
+        n_nodes = self.graph.number_of_nodes()
+        adj = nx.to_scipy_sparse_array(self.graph, nodelist=list(self.graph.nodes()),
+                                       weight=None, format='csr')
+        indptr = np.concatenate([adj.indptr, np.full(n - n_nodes, adj.indptr[-1])])
+        self.adjacency = sp.csr_matrix((adj.data, adj.indices, indptr), shape=(n, n))
+        self._has_selfloop = self.adjacency.diagonal() != 0
+        # Scratch membership mask, reset after each use
+        self._in_cluster = np.zeros(n, dtype=bool)
+    
+    def _cluster_edge_counts(self, rows: np.ndarray) -> tuple:
+        """
+        Count intra-cluster edges and edges leaving a cluster.
+        
+        Args:
+            rows: Row indices of the cluster's proteins
+            
+        Returns:
+            (intra_edges, inter_edges); self-loops are not counted as intra edges
+        """
+        cluster_adj = self.adjacency[rows]
+        mask = self._in_cluster
+        mask[rows] = True
+        # Internal endpoints: every intra edge is seen from both ends,
+        # a self-loop once
+        internal = int(mask[cluster_adj.indices].sum())
+        mask[rows] = False
+        
+        selfloops = int(self._has_selfloop[rows].sum())
+        intra_edges = (internal - selfloops) // 2
+        inter_edges = cluster_adj.nnz - internal
+        return intra_edges, inter_edges
+    
+    def _cluster_rows(self, cluster: Set[str]) -> np.ndarray:
+        """Rows of the adjacency and FD matrices for the proteins of a cluster."""
+        index = self.protein_index
+        return np.fromiter((index[p] for p in cluster if p in index), dtype=np.int64)
+    
+    def cluster_fd(self, cluster: Set[str], cluster_id: int) -> np.ndarray:
+        """
+        Normalized functional dependency of every protein in a cluster.
+        
+        Matches calculate_functional_dependency(normalize=True); proteins without
+        GO terms get 0.
+        
+        Args:
+            cluster: Set of protein IDs
+            cluster_id: Cluster ID (selects the TF-IDF scores)
+            
+        Returns:
+            Array of FD values in [-1, 1]
+        """
+        # fd_matrix rows follow protein_index
+        fd = self.fd_matrix.matrix[self._cluster_rows(cluster)][:, self.fd_matrix.column(cluster_id)]
+        return fd.toarray().ravel()
     
     def compute_fitness(self, solution: np.ndarray, 
                        lambda_inter: float = 1.0,
@@ -74,8 +166,6 @@ class MembershipFitness:
         transfer_tau = np.clip(solution[2], 0.0, 1.0)
         
         # Apply overlap reassignment with these parameters
-        from src.membership_overlap import apply_overlap_reassignment
-        
         try:
             optimized_clusters = apply_overlap_reassignment(
                 self.initial_clusters,
@@ -85,7 +175,10 @@ class MembershipFitness:
                 self.permanence_scores,
                 alpha=alpha,
                 overlap_tau=overlap_tau,
-                transfer_tau=transfer_tau
+                transfer_tau=transfer_tau,
+                fd_matrix=self.fd_matrix,
+                neighbor_sets=self.neighbor_sets,
+                membership_cache=self._reassignment_cache
             )
         except Exception as e:
             logger.warning(f"Error in overlap reassignment: {e}")
@@ -109,22 +202,25 @@ class MembershipFitness:
             # Average membership in cluster
             cluster_membership_sum = 0.0
             cluster_size = len(cluster)
+            cluster_set = frozenset(cluster)
+            rows = self._cluster_rows(cluster_set)
+            
+            # Intra-cluster edges and edges to the rest of the graph, counted on
+            # the CSR adjacency (inter edges are used for the coupling penalty)
+            intra_edges, inter_edges = self._cluster_edge_counts(rows)
             
-            # Intra-cluster edges
-            intra_edges = 0
-            cluster_list = list(cluster)
-            for i, p1 in enumerate(cluster_list):
-                for p2 in cluster_list[i+1:]:
-                    if self.graph.has_edge(p1, p2):
-                        intra_edges += 1
-                
-                # Calculate membership for this protein
-                from src.membership_overlap import calculate_membership
-                memb = calculate_membership(
-                    p1, cluster, cluster_id, self.graph,
-                    self.protein_go_terms, self.go_tfidf,
-                    self.permanence_scores, alpha
-                )
+            for p1 in cluster_set:
+                # Calculate membership for this protein. Permanence and FD
+                # depend only on (protein, cluster_id), so they are cached
+                # across evaluations and only the alpha weighting is redone.
+                key = (p1, cluster_id)
+                components = self._membership_cache.get(key)
+                if components is None:
+                    perm_norm = get_permanence(self.permanence_scores, p1, cluster_id)
+                    fd_norm = self.fd_matrix.get(p1, cluster_id)
+                    components = (perm_norm, fd_norm)
+                    self._membership_cache[key] = components
+                memb = combine_membership(components[0], components[1], alpha)
                 cluster_membership_sum += memb
                 membership_count += 1
             
@@ -138,22 +234,10 @@ class MembershipFitness:
                 intra_cohesion += cohesion * cluster_size
             
             # Inter-cluster coupling: edges from cluster to other clusters
-            inter_edges = 0
-            for protein in cluster:
-                neighbors = set(self.graph.neighbors(protein))
-                inter_edges += len(neighbors - cluster)
-            
             inter_coupling += inter_edges
             
             # GO coherence: average functional dependency in cluster
-            from src.membership_overlap import calculate_functional_dependency
-            cluster_fd_sum = 0.0
-            for protein in cluster:
-                fd = calculate_functional_dependency(
-                    protein, cluster, self.protein_go_terms,
-                    self.go_tfidf, cluster_id
-                )
-                cluster_fd_sum += fd
+            cluster_fd_sum = float(self.cluster_fd(cluster_set, cluster_id).sum())
             
             avg_fd = cluster_fd_sum / cluster_size if cluster_size > 0 else 0.0
             go_coherence_sum += avg_fd * cluster_size
@@ -198,10 +282,45 @@ class MembershipFitness:
         Returns:
             Fitness function that takes solution vector and returns scalar (to minimize)
         """
-        def fitness_func(solution: np.ndarray) -> float:
-            fitness = self.compute_fitness(solution, lambda_inter, lambda_fragment)
-            # Negate for minimization (LEA minimizes)
-            return -fitness
-        
-        return fitness_func
+        return _FitnessFunction(self, lambda_inter, lambda_fragment)
 
+
+class _FitnessFunction:
+    """
+    LEA fitness callable (minimization) built by create_fitness_function.
+    
+    Nearby LEA candidates often land on the same reassignment, so results are
+    memoized on the solution rounded to FITNESS_CACHE_DECIMALS. Instances are
+    picklable (the cache is dropped) so they can be shipped to worker processes.
+    """
+    
+    def __init__(self, fitness: MembershipFitness, lambda_inter: float,
+                 lambda_fragment: float):
+        self.fitness = fitness
+        self.lambda_inter = lambda_inter
+        self.lambda_fragment = lambda_fragment
+        self._init_cache()
+    
+    def _init_cache(self):
+        self._cached_fitness = functools.lru_cache(maxsize=FITNESS_CACHE_SIZE)(self._evaluate)
+        self.cache_info = self._cached_fitness.cache_info
+    
+    def _evaluate(self, alpha: float, overlap_tau: float, transfer_tau: float) -> float:
+        solution = np.array([alpha, overlap_tau, transfer_tau])
+        return self.fitness.compute_fitness(solution, self.lambda_inter, self.lambda_fragment)
+    
+    def __call__(self, solution: np.ndarray) -> float:
+        key = tuple(round(float(x), FITNESS_CACHE_DECIMALS) for x in solution[:3])
+        fitness = self._cached_fitness(*key)
+        # Negate for minimization (LEA minimizes)
+        return -fitness
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_cached_fitness']
+        del state['cache_info']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_cache()
@@ -7,10 +7,52 @@ Only the fitness function and decision variables are adapted for community detec
 import numpy as np
 from scipy.special import gamma
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to NumPy
+    njit = None
 
 logger = logging.getLogger(__name__)
 
 
+def _lea_step_numpy(population, best, alpha, u, v, beta, lower, upper):
+    """Move population (in place) towards best plus a Levy step, clipped to bounds."""
+    step = alpha * (best - population) + 0.01 * (u / np.abs(v) ** (1 / beta))
+    np.clip(population + step, lower, upper, out=population)
+
+
+def _lea_step_loop(population, best, alpha, u, v, beta, lower, upper):
+    """Loop form of _lea_step_numpy for compilation with numba."""
+    inv_beta = 1.0 / beta
+    n, d = population.shape
+    for i in range(n):
+        for j in range(d):
+            x = population[i, j]
+            x += alpha * (best[j] - x) + 0.01 * (u[i, j] / abs(v[i, j]) ** inv_beta)
+            population[i, j] = min(max(x, lower[j]), upper[j])
+
+
+_lea_step = njit(cache=True, fastmath=True)(_lea_step_loop) if njit is not None else _lea_step_numpy
+
+
+# Fitness function of a worker process, set once by _init_worker
+_worker_fitness_function = None
+
+
+def _init_worker(fitness_function):
+    """Process pool initializer: receive the fitness function once per worker."""
+    global _worker_fitness_function
+    _worker_fitness_function = fitness_function
+
+
+def _evaluate_in_worker(solution):
+    """Evaluate one solution with the worker's fitness function."""
+    return _worker_fitness_function(solution)
+
+
 class LotusEffectAlgorithm:
     """
     Lotus Effect Algorithm for optimization.
@@ -18,7 +60,8 @@ class LotusEffectAlgorithm:
     """
     
     def __init__(self, population_size, dimensions, lower_bound, upper_bound, 
-                 max_function_evaluations, fitness_function, random_seed=None):
+                 max_function_evaluations, fitness_function, random_seed=None,
+                 n_workers=1, patience=20, tol=1e-5):
         """
         Initialize LEA.
         
@@ -30,26 +73,29 @@ class LotusEffectAlgorithm:
             max_function_evaluations: Maximum number of fitness evaluations
             fitness_function: Function to minimize (takes solution vector, returns scalar)
             random_seed: Random seed for reproducibility
+            n_workers: Number of worker processes for fitness evaluation
+                      (1 = evaluate sequentially in this process). The fitness
+                      function must be picklable when n_workers > 1.
+            patience: Stop early once the best fitness improved by less than
+                      tol over this many iterations (None or 0 disables)
+            tol: Minimum improvement of the best fitness over patience iterations
         """
-        if random_seed is not None:
-            np.random.seed(random_seed)
-            
+        # Dedicated generator, so the global NumPy RNG is left untouched
+        self.rng = np.random.default_rng(random_seed)
+        
         self.population_size = population_size
         self.dimensions = dimensions
         self.lower_bound = np.array(lower_bound) if isinstance(lower_bound, (list, np.ndarray)) else lower_bound
         self.upper_bound = np.array(upper_bound) if isinstance(upper_bound, (list, np.ndarray)) else upper_bound
         self.max_function_evaluations = max_function_evaluations
         self.fitness_function = fitness_function
+        self.n_workers = n_workers
+        self._executor = None  # Process pool, alive during optimize()
         
-        # Initialize population
-        if isinstance(self.lower_bound, np.ndarray) and len(self.lower_bound) == dimensions:
-            self.population = np.random.uniform(
-                self.lower_bound, self.upper_bound, (population_size, dimensions)
-            )
-        else:
-            self.population = np.random.uniform(
-                self.lower_bound, self.upper_bound, (population_size, dimensions)
-            )
+        # Initialize population (scalar and per-dimension bounds both broadcast)
+        self.population = self.rng.uniform(
+            self.lower_bound, self.upper_bound, (population_size, dimensions)
+        )
         
         self.best_solution = self.population[0].copy()
         self.best_fitness = float('inf')
@@ -59,50 +105,84 @@ class LotusEffectAlgorithm:
         self.memory = []  # Store previous best solutions
         self.history = []  # Store best fitness per iteration
         
-    def levy_flight(self):
+        # Plateau detection: best fitness of the last patience iterations
+        self.patience = patience
+        self.tol = tol
+        self._best_history_window = deque(maxlen=patience) if patience else None
+        
+        # Levy flight scale (Mantegna's method); constant since beta is fixed
+        b = self.beta
+        self._sigma = (gamma(1 + b) * np.sin(np.pi * b / 2) /
+                       (gamma((1 + b) / 2) * b * 2 ** ((b - 1) / 2))) ** (1 / b)
+        
+        # Per-dimension bounds for the update kernel
+        self._lower = np.broadcast_to(np.asarray(self.lower_bound, dtype=float), (dimensions,)).copy()
+        self._upper = np.broadcast_to(np.asarray(self.upper_bound, dtype=float), (dimensions,)).copy()
+        
+    def levy_flight(self, n=None):
         """
         Generate Levy flight step for exploration.
+        
+        Args:
+            n: Number of steps to draw. If None, returns a single step of shape
+               (dimensions,), otherwise an array of shape (n, dimensions).
         """
-        sigma = (gamma(1 + self.beta) * np.sin(np.pi * self.beta / 2) /
-                 (gamma((1 + self.beta) / 2) * self.beta * 2 ** ((self.beta - 1) / 2))) ** (1 / self.beta)
-        u = np.random.normal(0, sigma, size=self.dimensions)
-        v = np.random.normal(0, 1, size=self.dimensions)
+        size = self.dimensions if n is None else (n, self.dimensions)
+        u = self.rng.normal(0, self._sigma, size=size)
+        v = self.rng.normal(0, 1, size=size)
         step = u / np.abs(v) ** (1 / self.beta)
         return 0.01 * step
     
     def update_positions(self):
         """
         Update positions of all individuals using LEA mechanics.
+        
+        The whole population is moved in one step (compiled with numba when
+        available); only as many individuals as the remaining evaluation
+        budget allows are updated. Moving individuals costs no evaluations,
+        the budget is only charged in evaluate_fitness.
         """
-        for i in range(self.population_size):
-            if self.function_evaluations >= self.max_function_evaluations:
-                return
-            step = self.alpha * (self.best_solution - self.population[i]) + self.levy_flight()
-            self.population[i] += step
-            
-            # Clip to bounds
-            if isinstance(self.lower_bound, np.ndarray):
-                self.population[i] = np.clip(self.population[i], self.lower_bound, self.upper_bound)
-            else:
-                self.population[i] = np.clip(self.population[i], self.lower_bound, self.upper_bound)
-            
-            self.function_evaluations += 1
+        n = min(self.population_size,
+                self.max_function_evaluations - self.function_evaluations)
+        if n <= 0:
+            return
+        
+        # Levy flight random draws, as in levy_flight
+        u = self.rng.normal(0, self._sigma, size=(n, self.dimensions))
+        v = self.rng.normal(0, 1, size=(n, self.dimensions))
+        
+        # Move towards best solution and clip to bounds (in place)
+        _lea_step(self.population[:n], self.best_solution, self.alpha,
+                  u, v, self.beta, self._lower, self._upper)
     
     def evaluate_fitness(self):
         """
         Evaluate fitness for all individuals and update best solution.
+        
+        Individuals are independent, so when a process pool is running they
+        are evaluated in parallel; the best solution is updated in order.
         """
-        for i in range(self.population_size):
-            if self.function_evaluations >= self.max_function_evaluations:
-                return
-            fitness = self.fitness_function(self.population[i])
-            self.function_evaluations += 1
-            
+        n = min(self.population_size,
+                self.max_function_evaluations - self.function_evaluations)
+        if n <= 0:
+            return
+        
+        if self._executor is not None:
+            fitnesses = list(self._executor.map(_evaluate_in_worker, self.population[:n]))
+        else:
+            fitnesses = [self.fitness_function(self.population[i]) for i in range(n)]
+        self.function_evaluations += n
+        
+        for i, fitness in enumerate(fitnesses):
             if fitness < self.best_fitness:
                 self.best_fitness = fitness
                 self.best_solution = self.population[i].copy()
                 self.memory.append(self.best_solution)
         
+        # Budget ran out part-way through the population
+        if n < self.population_size:
+            return
+        
         self.history.append(self.best_fitness)
     
     def optimize(self):
@@ -114,12 +194,34 @@ class LotusEffectAlgorithm:
             best_fitness: Best fitness value
             function_evaluations: Total function evaluations used
         """
+        if self.n_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.n_workers,
+                                     initializer=_init_worker,
+                                     initargs=(self.fitness_function,)) as executor:
+                self._executor = executor
+                try:
+                    self._run()
+                finally:
+                    self._executor = None
+        else:
+            self._run()
+        
+        return self.best_solution, self.best_fitness, self.function_evaluations
+    
+    def _run(self):
+        """Main LEA loop until the evaluation budget is spent or fitness plateaus."""
+        window = self._best_history_window
         while self.function_evaluations < self.max_function_evaluations:
             self.update_positions()
             self.evaluate_fitness()
             
             if len(self.history) % 100 == 0:
                 logger.debug(f"Evaluations: {self.function_evaluations}, Best Fitness: {self.best_fitness:.6f}")
-        
-        return self.best_solution, self.best_fitness, self.function_evaluations
+            
+            if window is not None:
+                window.append(self.best_fitness)
+                if len(window) == self.patience and max(window) - min(window) < self.tol:
+                    logger.info(f"LEA converged after {self.function_evaluations} evaluations "
+                                f"(no improvement above {self.tol} in {self.patience} iterations)")
+                    break
 
@@ -9,6 +9,7 @@ import networkx as nx
 
 from .lotus_effect_algorithm import LotusEffectAlgorithm
 from .fitness_membership import MembershipFitness
+from src.membership_overlap import apply_overlap_reassignment
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +23,10 @@ def optimize_communities(graph: nx.Graph,
                          max_evaluations: int = 1000,
                          lambda_inter: float = 1.0,
                          lambda_fragment: float = 0.5,
-                         random_seed: int = None) -> Tuple[np.ndarray, float, Dict[int, Set[str]]]:
+                         random_seed: int = None,
+                         n_workers: int = 1,
+                         patience: int = 20,
+                         tol: float = 1e-5) -> Tuple[np.ndarray, float, Dict[int, Set[str]]]:
     """
     Optimize community membership using LEA.
     
@@ -42,6 +46,10 @@ def optimize_communities(graph: nx.Graph,
         lambda_inter: Weight for inter-cluster penalty
         lambda_fragment: Weight for fragmentation penalty
         random_seed: Random seed for reproducibility
+        n_workers: Number of processes for parallel fitness evaluation
+        patience: Iterations without improvement above tol before LEA stops
+                  early (None or 0 runs the full evaluation budget)
+        tol: Minimum best-fitness improvement over patience iterations
         
     Returns:
         (best_solution, best_fitness, optimized_clusters)
@@ -68,7 +76,10 @@ def optimize_communities(graph: nx.Graph,
         upper_bound=upper_bounds,
         max_function_evaluations=max_evaluations,
         fitness_function=fitness_func,
-        random_seed=random_seed
+        random_seed=random_seed,
+        n_workers=n_workers,
+        patience=patience,
+        tol=tol
     )
     
     best_solution, best_fitness, evaluations = lea.optimize()
@@ -84,8 +95,6 @@ def optimize_communities(graph: nx.Graph,
     overlap_tau = np.clip(best_solution[1], 0.0, 1.0)
     transfer_tau = np.clip(best_solution[2], 0.0, 1.0)
     
-    from src.membership_overlap import apply_overlap_reassignment
-    
     optimized_clusters = apply_overlap_reassignment(
         initial_clusters,
         graph,
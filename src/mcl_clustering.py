@@ -3,14 +3,38 @@ MCL (Markov Cluster Algorithm) clustering for initial community detection.
 """
 
 import logging
+import functools
+import inspect
 import subprocess
+from collections import defaultdict
 import tempfile
 import os
 import networkx as nx
-from typing import Dict, List, Set
+import pandas as pd
+from typing import Dict, List, Optional, Set
 
 logger = logging.getLogger(__name__)
 
+# Larger edge lists go to MCL through a temporary file instead of a pipe,
+# so their text form is not held in memory
+MCL_PIPE_MAX_EDGES = 5_000_000
+
+# Bounds for the Louvain fallback, so it terminates predictably on large
+# sparse PPI graphs (the seed is also used by the Leiden fallback)
+LOUVAIN_SEED = 42
+LOUVAIN_MAX_LEVEL = 10
+LOUVAIN_THRESHOLD = 1e-4
+
+
+@functools.lru_cache(maxsize=None)
+def _mcl_available() -> bool:
+    """Check once per process whether the mcl executable can be run."""
+    try:
+        subprocess.run(['mcl', '--version'], capture_output=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+    return True
+
 
 class MCLClustering:
     """
@@ -43,50 +67,86 @@ class MCLClustering:
         logger.info(f"Running MCL clustering (inflation={self.inflation})...")
         
         # Check if MCL is available
-        try:
-            subprocess.run(['mcl', '--version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        if not _mcl_available():
             logger.warning("MCL not found. Using NetworkX-based approximation.")
             return self._fallback_clustering(graph)
         
-        # Write graph to temporary file in MCL format
+        # Edge list in MCL's label format (label pairs with weights),
+        # formatted in one pass by pandas' writer
+        edges = nx.to_pandas_edgelist(graph, source='u', target='v')
+        edges['weight'] = edges['weight'].fillna(1.0) if 'weight' in edges else 1.0
+        
+        try:
+            if len(edges) <= MCL_PIPE_MAX_EDGES:
+                output = self._run_mcl_piped(edges)
+            else:
+                output = self._run_mcl_tempfile(edges)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"MCL failed: {e.stderr.decode('utf-8', errors='replace')}")
+            return self._fallback_clustering(graph)
+        
+        # Parse MCL output (one tab-separated cluster per line) and filter
+        # small clusters, decoding only the protein IDs
+        clusters = {}
+        cluster_id = 0
+        filtered_count = 0
+        
+        for line in output.split(b'\n'):
+            cluster_set = {name.decode('utf-8') for name in line.strip().split(b'\t') if name}
+            if not cluster_set:
+                continue
+            # Filter clusters smaller than min_cluster_size
+            if len(cluster_set) >= self.min_cluster_size:
+                clusters[cluster_id] = cluster_set
+                cluster_id += 1
+            else:
+                filtered_count += 1
+        
+        logger.info(f"MCL found {len(clusters)} clusters (filtered {filtered_count} clusters < {self.min_cluster_size} proteins)")
+        return clusters
+    
+    def _mcl_command(self, input_path: str, output_path: str) -> List[str]:
+        """MCL command line for label input ('-' paths use stdin/stdout)."""
+        return ['mcl', input_path, '--abc', '-I', str(self.inflation), '-o', output_path]
+    
+    def _run_mcl_piped(self, edges: pd.DataFrame) -> bytes:
+        """
+        Run MCL with the edge list on stdin and the clustering on stdout.
+        
+        Args:
+            edges: Edge list with columns u, v, weight
+            
+        Returns:
+            Raw MCL output
+        """
+        edge_bytes = edges.to_csv(sep='\t', header=False, index=False,
+                                  columns=['u', 'v', 'weight']).encode('utf-8')
+        result = subprocess.run(self._mcl_command('-', '-'), input=edge_bytes,
+                                capture_output=True, check=True)
+        return result.stdout
+    
+    def _run_mcl_tempfile(self, edges: pd.DataFrame) -> bytes:
+        """
+        Run MCL through temporary files, for edge lists too large to hold as text.
+        
+        Args:
+            edges: Edge list with columns u, v, weight
+            
+        Returns:
+            Raw MCL output
+        """
         with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt') as tmp_in:
-            # Write edges with weights
-            for u, v, data in graph.edges(data=True):
-                weight = data.get('weight', 1.0)
-                tmp_in.write(f"{u}\t{v}\t{weight}\n")
+            edges.to_csv(tmp_in, sep='\t', header=False, index=False,
+                         columns=['u', 'v', 'weight'])
             tmp_in_path = tmp_in.name
         
         tmp_out_path = tmp_in_path + '.out'
         
         try:
-            # Run MCL
-            cmd = ['mcl', tmp_in_path, '--abc', '-I', str(self.inflation), '-o', tmp_out_path]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            # Parse MCL output and filter small clusters
-            clusters = {}
-            cluster_id = 0
-            filtered_count = 0
-            
-            with open(tmp_out_path, 'r') as f:
-                for line in f:
-                    proteins = line.strip().split('\t')
-                    if proteins and proteins[0]:
-                        cluster_set = set(proteins)
-                        # Filter clusters smaller than min_cluster_size
-                        if len(cluster_set) >= self.min_cluster_size:
-                            clusters[cluster_id] = cluster_set
-                            cluster_id += 1
-                        else:
-                            filtered_count += 1
-            
-            logger.info(f"MCL found {len(clusters)} clusters (filtered {filtered_count} clusters < {self.min_cluster_size} proteins)")
-            return clusters
-            
-        except subprocess.CalledProcessError as e:
-            logger.error(f"MCL failed: {e.stderr}")
-            return self._fallback_clustering(graph)
+            subprocess.run(self._mcl_command(tmp_in_path, tmp_out_path),
+                           capture_output=True, check=True)
+            with open(tmp_out_path, 'rb') as f:
+                return f.read()
         finally:
             # Cleanup
             if os.path.exists(tmp_in_path):
@@ -97,38 +157,115 @@ class MCLClustering:
     def _fallback_clustering(self, graph: nx.Graph) -> Dict[int, Set[str]]:
         """
         Fallback to NetworkX community detection if MCL is not available.
-        Uses Louvain algorithm as approximation.
+        Uses Leiden (graspologic or leidenalg) when installed, otherwise a
+        bounded Louvain algorithm as approximation.
         """
-        logger.info("Using Louvain algorithm as fallback...")
-        try:
-            import community.community_louvain as community_louvain
-            partition = community_louvain.best_partition(graph)
-            
-            clusters = {}
-            filtered_count = 0
-            
-            for node, cluster_id in partition.items():
-                if cluster_id not in clusters:
-                    clusters[cluster_id] = set()
-                clusters[cluster_id].add(node)
-            
-            # Filter small clusters
-            filtered_clusters = {}
-            cluster_id_new = 0
-            for old_id, cluster_set in clusters.items():
-                if len(cluster_set) >= self.min_cluster_size:
-                    filtered_clusters[cluster_id_new] = cluster_set
-                    cluster_id_new += 1
-                else:
-                    filtered_count += 1
-            
-            logger.info(f"Louvain found {len(filtered_clusters)} clusters (filtered {filtered_count} clusters < {self.min_cluster_size} proteins)")
-            return filtered_clusters
-        except ImportError:
-            logger.warning("python-louvain not available. Using simple connected components.")
+        method = "Leiden"
+        partition = self._leiden_partition(graph)
+        if partition is None:
+            method = "Louvain"
+            logger.info("Using Louvain algorithm as fallback...")
+            partition = self._louvain_partition(graph)
+        else:
+            logger.info("Using Leiden algorithm as fallback...")
+        if partition is None:
+            logger.warning("No Louvain implementation available. Using simple connected components.")
             clusters = {}
             for i, component in enumerate(nx.connected_components(graph)):
                 clusters[i] = component
             logger.info(f"Found {len(clusters)} connected components")
             return clusters
+        
+        # Group nodes by community, then build sets (renumbered from 0) only
+        # for communities with at least min_cluster_size nodes
+        groups = defaultdict(list)
+        for node, cluster_id in partition.items():
+            groups[cluster_id].append(node)
+        
+        kept = (nodes for nodes in groups.values() if len(nodes) >= self.min_cluster_size)
+        filtered_clusters = {i: set(nodes) for i, nodes in enumerate(kept)}
+        filtered_count = len(groups) - len(filtered_clusters)
+        
+        logger.info(f"{method} found {len(filtered_clusters)} clusters (filtered {filtered_count} clusters < {self.min_cluster_size} proteins)")
+        return filtered_clusters
+    
+    def _leiden_partition(self, graph: nx.Graph) -> Optional[Dict[str, int]]:
+        """
+        Leiden partition of the graph from a compiled implementation.
+        
+        Tries graspologic first, then leidenalg with python-igraph. Every
+        node of the graph is assigned, isolated nodes as singletons.
+        
+        Args:
+            graph: NetworkX graph
+            
+        Returns:
+            Dict mapping node to community ID, or None if neither package
+            is installed
+        """
+        try:
+            from graspologic.partition import leiden
+        except ImportError:
+            leiden = None
+        if leiden is not None:
+            partition = leiden(graph, weight_attribute='weight', random_seed=LOUVAIN_SEED)
+            # graspologic leaves out isolated nodes; each becomes its own community
+            next_id = max(partition.values(), default=-1) + 1
+            for node in graph:
+                if node not in partition:
+                    partition[node] = next_id
+                    next_id += 1
+            return partition
+        
+        try:
+            import igraph as ig
+            import leidenalg
+        except ImportError:
+            return None
+        nodes = list(graph)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = []
+        weights = []
+        for u, v, weight in graph.edges(data='weight', default=1.0):
+            edges.append((node_index[u], node_index[v]))
+            weights.append(weight)
+        ig_graph = ig.Graph(n=len(nodes), edges=edges)
+        partition = leidenalg.find_partition(ig_graph, leidenalg.ModularityVertexPartition,
+                                             weights=weights, seed=LOUVAIN_SEED)
+        return {nodes[i]: cid for i, cid in enumerate(partition.membership)}
+    
+    def _louvain_partition(self, graph: nx.Graph) -> Optional[Dict[str, int]]:
+        """
+        Bounded Louvain partition of the graph.
+        
+        Uses NetworkX's louvain_communities, or python-louvain on NetworkX
+        versions without it (or without max_level), both limited to
+        LOUVAIN_MAX_LEVEL levels.
+        
+        Args:
+            graph: NetworkX graph
+            
+        Returns:
+            Dict mapping node to community ID, or None if no Louvain
+            implementation is available
+        """
+        louvain_communities = getattr(nx.community, 'louvain_communities', None)
+        # max_level is not supported by older NetworkX
+        if (louvain_communities is not None
+                and 'max_level' in inspect.signature(louvain_communities).parameters):
+            communities = louvain_communities(
+                graph, weight='weight', seed=LOUVAIN_SEED,
+                max_level=LOUVAIN_MAX_LEVEL, threshold=LOUVAIN_THRESHOLD
+            )
+            return {node: i for i, community in enumerate(communities) for node in community}
+        
+        try:
+            import community.community_louvain as community_louvain
+        except ImportError:
+            return None
+        dendrogram = community_louvain.generate_dendrogram(graph, weight='weight',
+                                                           random_state=LOUVAIN_SEED)
+        return community_louvain.partition_at_level(
+            dendrogram, min(LOUVAIN_MAX_LEVEL, len(dendrogram)) - 1
+        )
 
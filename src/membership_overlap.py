@@ -4,12 +4,26 @@ Implements Eq.2 (functional dependency fd) and Eq.4 (Membership).
 Handles overlapping community assignment.
 """
 
+import math
 import logging
-from typing import Dict, Set, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, Set, List, Tuple, Iterable, Optional
+import numpy as np
+import scipy.sparse as sp
 import networkx as nx
 
+from src.permanence import csr_adjacency, get_permanence
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to NumPy
+    njit = None
+
 logger = logging.getLogger(__name__)
 
+_EMPTY = frozenset()
+
 
 def calculate_functional_dependency(protein: str, cluster: Set[str],
                                    protein_go_terms: Dict[str, Set[str]],
@@ -29,7 +43,7 @@ def calculate_functional_dependency(protein: str, cluster: Set[str],
     
     Args:
         protein: Protein ID
-        cluster: Set of protein IDs in cluster
+        cluster: Set of protein IDs in cluster (not read; fd depends only on cluster_id)
         protein_go_terms: Dict mapping protein ID to GO terms
         go_tfidf: GOTFIDF instance for TF-IDF scores
         cluster_id: Cluster ID
@@ -61,16 +75,104 @@ def calculate_functional_dependency(protein: str, cluster: Set[str],
         # then map to [-1, 1] by: normalized = 2 * (fd / max_fd) - 1
         # For simplicity and to ensure bounded range, use tanh which naturally bounds to [-1, 1]
         # This handles the case where we don't know the theoretical maximum TF-IDF
-        import math
-        fd_normalized = math.tanh(fd_score)
-        
-        # Ensure strict bounds
-        fd_normalized = max(-1.0, min(1.0, fd_normalized))
-        return fd_normalized
+        # (tanh is bounded, so no further clipping is needed)
+        return math.tanh(fd_score)
     
     return fd_score
 
 
+class FunctionalDependencyMatrix:
+    """
+    Functional dependency fd(p,c) (Eq.2) of many proteins for all clusters.
+    
+    All scores come from one sparse product FD = P @ T.T, where P is the
+    (proteins x GO terms) matrix with entries 1/|GO(p)| and T is the
+    (clusters x GO terms) TF-IDF matrix of a GOTFIDF instance. Values match
+    calculate_functional_dependency.
+    """
+    
+    def __init__(self, proteins: Iterable[str],
+                 protein_go_terms: Dict[str, Set[str]],
+                 go_tfidf: 'GOTFIDF',
+                 normalize: bool = True):
+        """
+        Compute the FD matrix.
+        
+        Args:
+            proteins: Protein IDs to score (one row each)
+            protein_go_terms: Dict mapping protein ID to GO terms
+            go_tfidf: GOTFIDF instance for TF-IDF scores
+            normalize: If True, normalize scores to [-1, 1] with tanh
+        """
+        self.protein_index = {p: i for i, p in enumerate(dict.fromkeys(proteins))}
+        self.cluster_ids = list(go_tfidf.cluster_ids)
+        self.cluster_index = {cid: j for j, cid in enumerate(self.cluster_ids)}
+        # Clusters unknown to go_tfidf map to a trailing column of zeros
+        self._unknown_column = len(self.cluster_ids)
+        
+        term_index = go_tfidf.term_index
+        rows, cols, vals = [], [], []
+        for protein, i in self.protein_index.items():
+            go_terms = protein_go_terms.get(protein)
+            if not go_terms:
+                continue
+            # Terms outside the TF-IDF index score 0 but still count in |GO(p)|
+            weight = 1.0 / len(go_terms)
+            for go_term in go_terms:
+                col = term_index.get(go_term)
+                if col is not None:
+                    rows.append(i)
+                    cols.append(col)
+                    vals.append(weight)
+        
+        protein_matrix = sp.csr_matrix(
+            (vals, (rows, cols)), shape=(len(self.protein_index), go_tfidf.tfidf_matrix.shape[1])
+        )
+        fd = (protein_matrix @ go_tfidf.tfidf_matrix.T).tocsr()
+        if normalize:
+            # tanh(0) = 0, so normalizing keeps the sparsity pattern
+            np.tanh(fd.data, out=fd.data)
+        fd.resize((fd.shape[0], self._unknown_column + 1))
+        self.matrix = fd
+    
+    def column(self, cluster_id: int) -> int:
+        """Column of a cluster in get_row() arrays (all-zero if the cluster is unknown)."""
+        return self.cluster_index.get(cluster_id, self._unknown_column)
+    
+    def get_row(self, protein: str) -> np.ndarray:
+        """
+        Get the FD scores of a protein for all clusters.
+        
+        Args:
+            protein: Protein ID
+            
+        Returns:
+            Dense array indexed by column(cluster_id); zeros for unknown proteins
+        """
+        row = np.zeros(self.matrix.shape[1])
+        i = self.protein_index.get(protein)
+        if i is not None:
+            start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+            row[self.matrix.indices[start:end]] = self.matrix.data[start:end]
+        return row
+    
+    def get(self, protein: str, cluster_id: int) -> float:
+        """
+        Get fd(p,c) for one protein and cluster.
+        
+        Args:
+            protein: Protein ID
+            cluster_id: Cluster ID
+            
+        Returns:
+            Functional dependency score (0.0 for unknown proteins or clusters)
+        """
+        i = self.protein_index.get(protein)
+        if i is None:
+            return 0.0
+        return float(self.matrix[i, self.column(cluster_id)])
+
+
 def calculate_membership(protein: str, cluster: Set[str], cluster_id: int,
                          graph: nx.Graph,
                          protein_go_terms: Dict[str, Set[str]],
@@ -92,7 +194,7 @@ def calculate_membership(protein: str, cluster: Set[str], cluster_id: int,
     
     Args:
         protein: Protein ID
-        cluster: Set of protein IDs in cluster
+        cluster: Set of protein IDs in cluster (not read; see calculate_functional_dependency)
         cluster_id: Cluster ID
         graph: NetworkX graph
         protein_go_terms: Dict mapping protein ID to GO terms
@@ -103,16 +205,31 @@ def calculate_membership(protein: str, cluster: Set[str], cluster_id: int,
     Returns:
         Membership score (in range [-1, 1] since both inputs are normalized)
     """
-    # Ensure alpha is in valid range
-    alpha = max(0.0, min(1.0, alpha))
-    
     # Get normalized permanence (already normalized to [-1, 1])
-    perm_norm = permanence_scores.get(protein, {}).get(cluster_id, 0.0)
+    perm_norm = get_permanence(permanence_scores, protein, cluster_id)
     
     # Get normalized functional dependency (normalized to [-1, 1])
     fd_norm = calculate_functional_dependency(protein, cluster, protein_go_terms, 
                                               go_tfidf, cluster_id, normalize=True)
     
+    return combine_membership(perm_norm, fd_norm, alpha)
+
+
+def combine_membership(perm_norm: float, fd_norm: float, alpha: float = 0.5) -> float:
+    """
+    Combine normalized permanence and functional dependency into Membership (Eq.4).
+    
+    Args:
+        perm_norm: Normalized permanence in [-1, 1]
+        fd_norm: Normalized functional dependency in [-1, 1]
+        alpha: Weight parameter (0-1) balancing permanence and functional dependency
+        
+    Returns:
+        Membership score in range [-1, 1]
+    """
+    # Ensure alpha is in valid range
+    alpha = max(0.0, min(1.0, alpha))
+    
     # Calculate membership (Eq.4) with normalized inputs
     membership = alpha * perm_norm + (1 - alpha) * fd_norm
     
@@ -122,8 +239,22 @@ def calculate_membership(protein: str, cluster: Set[str], cluster_id: int,
     return membership
 
 
+def build_neighbor_sets(graph: nx.Graph) -> Dict[str, frozenset]:
+    """
+    Build the neighbor set of every protein in the graph once.
+    
+    Args:
+        graph: NetworkX graph
+        
+    Returns:
+        Dict mapping protein ID to frozenset of neighbors
+    """
+    return {protein: frozenset(nbrs) for protein, nbrs in graph._adj.items()}
+
+
 def calculate_intra_extra_links(protein: str, cluster: Set[str], 
-                                graph: nx.Graph) -> Tuple[int, int]:
+                                graph: nx.Graph,
+                                neighbor_sets: Optional[Dict[str, frozenset]] = None) -> Tuple[int, int]:
     """
     Calculate intra-cluster and extra-cluster links for a protein.
     
@@ -131,22 +262,30 @@ def calculate_intra_extra_links(protein: str, cluster: Set[str],
         protein: Protein ID
         cluster: Set of protein IDs in cluster
         graph: NetworkX graph
+        neighbor_sets: Optional precomputed neighbor sets (see build_neighbor_sets)
         
     Returns:
         (intra_links, extra_links) tuple
     """
-    if protein not in graph:
+    adj = graph._adj
+    if protein not in adj:
         return (0, 0)
     
-    neighbors = set(graph.neighbors(protein))
+    if neighbor_sets is not None:
+        neighbors = neighbor_sets[protein]
+    else:
+        # The adjacency dict's keys view is set-like, so no copy is needed
+        neighbors = adj[protein].keys()
+    # set & iterates the smaller operand; extra links follow without a set difference
     intra_links = len(neighbors & cluster)
-    extra_links = len(neighbors - cluster)
+    extra_links = len(neighbors) - intra_links
     
     return (intra_links, extra_links)
 
 
 def find_emax_cluster(protein: str, clusters: Dict[int, Set[str]], 
-                     graph: nx.Graph) -> int:
+                     graph: nx.Graph,
+                     neighbor_sets: Optional[Dict[str, frozenset]] = None) -> int:
     """
     Find the cluster with maximum external connections (E_max).
     
@@ -154,14 +293,19 @@ def find_emax_cluster(protein: str, clusters: Dict[int, Set[str]],
         protein: Protein ID
         clusters: Dict mapping cluster_id to set of proteins
         graph: NetworkX graph
+        neighbor_sets: Optional precomputed neighbor sets (see build_neighbor_sets)
         
     Returns:
         Cluster ID with maximum connections
     """
-    if protein not in graph:
+    adj = graph._adj
+    if protein not in adj:
         return -1
     
-    neighbors = set(graph.neighbors(protein))
+    if neighbor_sets is not None:
+        neighbors = neighbor_sets[protein]
+    else:
+        neighbors = adj[protein].keys()
     max_connections = 0
     emax_cluster_id = -1
     
@@ -177,6 +321,454 @@ def find_emax_cluster(protein: str, clusters: Dict[int, Set[str]],
     return emax_cluster_id
 
 
+def clusters_as_arrays(clusters: Dict[int, Set[str]],
+                       node_index: Dict[str, int]) -> Tuple[Dict[int, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Encode clusters as sorted int32 arrays of graph node indices.
+    
+    Args:
+        clusters: Dict mapping cluster_id to set of protein IDs
+        node_index: Dict mapping graph node to its index
+        
+    Returns:
+        (cluster_arrays, node_indptr, node_clusters): cluster_arrays maps
+        cluster_id to the sorted indices of its graph nodes (proteins not in
+        the graph are left out); node i is in the clusters at positions
+        node_clusters[node_indptr[i]:node_indptr[i+1]] of clusters
+    """
+    cluster_arrays = {}
+    for cluster_id, cluster in clusters.items():
+        rows = np.fromiter((node_index[p] for p in cluster if p in node_index), dtype=np.int32)
+        rows.sort()
+        cluster_arrays[cluster_id] = rows
+    
+    # Inverse mapping, node -> cluster positions, in CSR form
+    arrays = list(cluster_arrays.values())
+    members = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int32)
+    positions = np.repeat(np.arange(len(arrays), dtype=np.int32), [len(a) for a in arrays])
+    node_clusters = positions[np.argsort(members, kind='stable')]
+    node_indptr = np.zeros(len(node_index) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(members, minlength=len(node_index)), out=node_indptr[1:])
+    
+    return cluster_arrays, node_indptr, node_clusters
+
+
+def precompute_emax(clusters: Dict[int, Set[str]], graph) -> Dict[str, int]:
+    """
+    Find the E_max cluster of every protein in the clusters at once.
+    
+    Same result as find_emax_cluster for each protein. The neighbors of all
+    proteins are tallied per cluster in one sparse product (adjacency times
+    node -> cluster membership) instead of intersecting every neighbor set
+    with every cluster.
+    
+    Args:
+        clusters: Dict mapping cluster_id to set of proteins
+        graph: NetworkX graph
+    
+    Returns:
+        Dict mapping protein ID to E_max cluster ID (-1 if none)
+    """
+    node_index, indptr, indices = csr_adjacency(graph)
+    _, node_indptr, node_clusters = clusters_as_arrays(clusters, node_index)
+    n_nodes, n_clusters = len(node_index), len(clusters)
+    cluster_id_list = list(clusters)
+    
+    adjacency = sp.csr_matrix((np.ones(len(indices), dtype=np.int64), indices, indptr),
+                              shape=(n_nodes, n_nodes))
+    membership = sp.csr_matrix((np.ones(len(node_clusters), dtype=np.int64), node_clusters,
+                                node_indptr), shape=(n_nodes, n_clusters))
+    
+    # Neighbors of each node per cluster, without the clusters the node is in
+    counts = (adjacency @ membership).tocsr()
+    counts = (counts - counts.multiply(membership)).tocsr()
+    counts.eliminate_zeros()
+    counts.sort_indices()
+    
+    # The first (lowest position) cluster among the most connected, as
+    # find_emax_cluster keeps the first maximum in dict order
+    emax_pos = np.full(n_nodes, -1, dtype=np.int64)
+    has_counts = np.diff(counts.indptr) > 0
+    if has_counts.any():
+        emax_pos[has_counts] = np.asarray(counts.argmax(axis=1)).ravel()[has_counts]
+    
+    emax = {}
+    for cluster in clusters.values():
+        for protein in cluster:
+            i = node_index.get(protein)
+            emax[protein] = cluster_id_list[emax_pos[i]] if i is not None and emax_pos[i] >= 0 else -1
+    return emax
+
+
+def _build_cluster_labels(clusters: Dict[int, Set[str]],
+                          protein_pos: Dict[str, int]) -> Tuple[np.ndarray, Dict[int, Set[int]]]:
+    """
+    Encode clusters as per-protein cluster labels.
+    
+    Overlap is rare, so each protein gets a single primary label (the
+    position of its first cluster) in an int32 array and only proteins in
+    several clusters get an entry in extra_labels.
+    
+    Args:
+        clusters: Dict mapping cluster_id to set of proteins
+        protein_pos: Dict mapping every clustered protein to its position
+        
+    Returns:
+        (primary_label, extra_labels): primary cluster position of each
+        protein (-1 if none) and the positions of its other clusters
+    """
+    primary_label = [-1] * len(protein_pos)
+    extra_labels = {}
+    for pos, cluster in enumerate(clusters.values()):
+        for protein in cluster:
+            i = protein_pos[protein]
+            if primary_label[i] < 0:
+                primary_label[i] = pos
+            else:
+                extra_labels.setdefault(i, set()).add(pos)
+    return np.array(primary_label, dtype=np.int32), extra_labels
+
+
+def _protein_labels(i: int, primary_label: np.ndarray,
+                    extra_labels: Dict[int, Set[int]]) -> List[int]:
+    """Sorted cluster positions of protein i."""
+    primary = int(primary_label[i])
+    if primary < 0:
+        return []
+    return sorted({primary, *extra_labels.get(i, _EMPTY)})
+
+
+def _build_neighbor_positions(proteins: List[str], protein_pos: Dict[str, int],
+                              neighbor_sets: Dict[str, frozenset]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Neighbors of each protein as positions into proteins, in CSR layout.
+    
+    Neighbors outside the clusters carry no label and are left out.
+    
+    Args:
+        proteins: Proteins in processing order
+        protein_pos: Dict mapping protein ID to its position in proteins
+        neighbor_sets: Precomputed neighbor sets of the graph
+        
+    Returns:
+        (indptr, indices): neighbors of proteins[i] are indices[indptr[i]:indptr[i+1]]
+    """
+    indptr = [0]
+    indices = []
+    for protein in proteins:
+        indices.extend(protein_pos[n] for n in neighbor_sets.get(protein, _EMPTY)
+                       if n in protein_pos)
+        indptr.append(len(indices))
+    return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64)
+
+
+def _neighbor_label_counts(neighbors: np.ndarray, primary_label: np.ndarray,
+                           extra_labels: Dict[int, Set[int]], has_extra: np.ndarray,
+                           n_clusters: int) -> np.ndarray:
+    """
+    Number of the given neighbors in every cluster.
+    
+    Primary labels are counted in one bincount; only the few neighbors in
+    several clusters are walked in Python.
+    
+    Args:
+        neighbors: Positions of a protein's neighbors
+        primary_label: Primary cluster position of each protein (-1 if none)
+        extra_labels: Positions of the other clusters of overlapping proteins
+        has_extra: Boolean mask of the proteins present in extra_labels
+        n_clusters: Number of clusters
+        
+    Returns:
+        Array of length n_clusters with the neighbor count of each cluster
+    """
+    counts = np.bincount(primary_label[neighbors] + 1, minlength=n_clusters + 1)[1:]
+    overlapping = neighbors[has_extra[neighbors]]
+    if len(overlapping):
+        extra = np.fromiter(chain.from_iterable(extra_labels[j] for j in overlapping.tolist()),
+                            dtype=np.int64)
+        counts += np.bincount(extra, minlength=n_clusters)
+    return counts
+
+
+def _membership_gains_loop(i, perm_indptr, perm_pos, perm_vals,
+                           fd_rows, fd_indptr, fd_cols, fd_vals, fd_col_pos,
+                           cur_indptr, cur_pos, n_clusters, alpha):
+    """
+    Membership gain of protein i in every cluster over its best current cluster.
+    
+    Membership is Eq.4 as in combine_membership; current clusters get -inf.
+    Arrays are the CSR-style inputs built by _overlap_candidates.
+    """
+    perm = np.zeros(n_clusters)
+    for k in range(perm_indptr[i], perm_indptr[i + 1]):
+        perm[perm_pos[k]] = perm_vals[k]
+    fd = np.zeros(n_clusters)
+    row = fd_rows[i]
+    if row >= 0:
+        for k in range(fd_indptr[row], fd_indptr[row + 1]):
+            pos = fd_col_pos[fd_cols[k]]
+            if pos >= 0:
+                fd[pos] = fd_vals[k]
+    
+    gains = alpha * perm + (1 - alpha) * fd
+    for j in range(n_clusters):
+        gains[j] = min(max(gains[j], -1.0), 1.0)
+    
+    best = -np.inf
+    for k in range(cur_indptr[i], cur_indptr[i + 1]):
+        best = max(best, gains[cur_pos[k]])
+    gains -= best
+    for k in range(cur_indptr[i], cur_indptr[i + 1]):
+        gains[cur_pos[k]] = -np.inf
+    return gains
+
+
+def _no_candidates_without_fd_loop(i, perm_indptr, perm_pos, perm_vals, fd_rows, fd_indptr,
+                                   cur_indptr, cur_pos, alpha, overlap_tau):
+    """
+    Whether protein i can be skipped because no FD term can lift its gains.
+    
+    Without FD scores (no scored GO terms, or alpha == 1) membership is
+    alpha * perm, so the best gain is bounded by the largest permanence
+    (or 0 for clusters without one) minus the best current membership.
+    """
+    row = fd_rows[i]
+    if alpha < 1.0 and row >= 0 and fd_indptr[row + 1] > fd_indptr[row]:
+        return False
+    
+    upper = 0.0
+    for k in range(perm_indptr[i], perm_indptr[i + 1]):
+        upper = max(upper, min(max(alpha * perm_vals[k], -1.0), 1.0))
+    best = -np.inf
+    for c in range(cur_indptr[i], cur_indptr[i + 1]):
+        current = 0.0
+        for k in range(perm_indptr[i], perm_indptr[i + 1]):
+            if perm_pos[k] == cur_pos[c]:
+                current = alpha * perm_vals[k]
+        best = max(best, min(max(current, -1.0), 1.0))
+    return best > -np.inf and upper - best <= overlap_tau
+
+
+def _overlap_candidates_loop(perm_indptr, perm_pos, perm_vals,
+                             fd_rows, fd_indptr, fd_cols, fd_vals, fd_col_pos,
+                             cur_indptr, cur_pos, n_clusters, alpha, overlap_tau):
+    """
+    Loop form of _overlap_candidates_numpy for compilation with numba.
+    
+    A first pass counts the candidates of each protein, a second writes them
+    at their offsets.
+    """
+    n = len(fd_rows)
+    counts = np.zeros(n + 1, dtype=np.int64)
+    for i in range(n):
+        if _no_candidates_without_fd(i, perm_indptr, perm_pos, perm_vals, fd_rows, fd_indptr,
+                                     cur_indptr, cur_pos, alpha, overlap_tau):
+            continue
+        gains = _membership_gains(i, perm_indptr, perm_pos, perm_vals,
+                                  fd_rows, fd_indptr, fd_cols, fd_vals, fd_col_pos,
+                                  cur_indptr, cur_pos, n_clusters, alpha)
+        c = 0
+        for j in range(n_clusters):
+            if gains[j] > overlap_tau:
+                c += 1
+        counts[i + 1] = c
+    
+    offsets = np.cumsum(counts)
+    positions = np.empty(offsets[-1], dtype=np.int64)
+    candidate_gains = np.empty(offsets[-1])
+    for i in range(n):
+        if offsets[i + 1] == offsets[i]:
+            continue
+        gains = _membership_gains(i, perm_indptr, perm_pos, perm_vals,
+                                  fd_rows, fd_indptr, fd_cols, fd_vals, fd_col_pos,
+                                  cur_indptr, cur_pos, n_clusters, alpha)
+        k = offsets[i]
+        for j in range(n_clusters):
+            if gains[j] > overlap_tau:
+                positions[k] = j
+                candidate_gains[k] = gains[j]
+                k += 1
+    return offsets, positions, candidate_gains
+
+
+def _overlap_candidates_numpy(perm_indptr, perm_pos, perm_vals,
+                              fd_rows, fd_indptr, fd_cols, fd_vals, fd_col_pos,
+                              cur_indptr, cur_pos, n_clusters, alpha, overlap_tau):
+    """Overlap candidates of every protein, one vectorized membership row at a time."""
+    offsets = [0]
+    positions = []
+    candidate_gains = []
+    for i in range(len(fd_rows)):
+        if _no_candidates_without_fd(i, perm_indptr, perm_pos, perm_vals, fd_rows, fd_indptr,
+                                     cur_indptr, cur_pos, alpha, overlap_tau):
+            offsets.append(offsets[-1])
+            continue
+        perm = np.zeros(n_clusters)
+        perm[perm_pos[perm_indptr[i]:perm_indptr[i + 1]]] = perm_vals[perm_indptr[i]:perm_indptr[i + 1]]
+        fd = np.zeros(n_clusters)
+        row = fd_rows[i]
+        if row >= 0:
+            cols = fd_col_pos[fd_cols[fd_indptr[row]:fd_indptr[row + 1]]]
+            known = cols >= 0
+            fd[cols[known]] = fd_vals[fd_indptr[row]:fd_indptr[row + 1]][known]
+        
+        gains = alpha * perm + (1 - alpha) * fd
+        np.clip(gains, -1.0, 1.0, out=gains)
+        current = cur_pos[cur_indptr[i]:cur_indptr[i + 1]]
+        gains -= gains[current].max(initial=-np.inf)
+        gains[current] = -np.inf
+        
+        selected = np.flatnonzero(gains > overlap_tau)
+        positions.append(selected)
+        candidate_gains.append(gains[selected])
+        offsets.append(offsets[-1] + len(selected))
+    
+    return (np.array(offsets, dtype=np.int64),
+            np.concatenate(positions) if positions else np.empty(0, dtype=np.int64),
+            np.concatenate(candidate_gains) if candidate_gains else np.empty(0))
+
+
+if njit is not None:
+    _membership_gains = njit(cache=True)(_membership_gains_loop)
+    _no_candidates_without_fd = njit(cache=True)(_no_candidates_without_fd_loop)
+    _overlap_candidates_kernel = njit(cache=True)(_overlap_candidates_loop)
+else:
+    _membership_gains = _membership_gains_loop
+    _no_candidates_without_fd = _no_candidates_without_fd_loop
+    _overlap_candidates_kernel = _overlap_candidates_numpy
+
+
+def _pack_membership_inputs(proteins: List[str],
+                            primary_label: np.ndarray,
+                            extra_labels: Dict[int, Set[int]],
+                            cluster_order: Dict[int, int],
+                            permanence_scores: Dict[str, Dict[int, float]],
+                            fd_matrix: FunctionalDependencyMatrix) -> tuple:
+    """
+    Pack permanence, FD and current memberships into CSR-style arrays.
+    
+    The packed arrays do not depend on alpha or overlap_tau, so they can be
+    reused across calls with the same clusters (see apply_overlap_reassignment).
+    
+    Args:
+        proteins: Proteins in processing order
+        primary_label: Primary cluster position of each protein (-1 if none)
+        extra_labels: Positions of the other clusters of overlapping proteins
+        cluster_order: Dict mapping cluster ID to its position in the clusters dict
+        permanence_scores: Pre-computed permanence scores
+        fd_matrix: Normalized FD scores
+        
+    Returns:
+        Array arguments of _overlap_candidates_kernel up to n_clusters
+    """
+    perm_indptr = [0]
+    perm_pos = []
+    perm_vals = []
+    cur_indptr = [0]
+    cur_pos = []
+    for i, protein in enumerate(proteins):
+        for cid, perm in permanence_scores.get(protein, {}).items():
+            pos = cluster_order.get(cid)
+            if pos is not None:
+                perm_pos.append(pos)
+                perm_vals.append(perm)
+        perm_indptr.append(len(perm_pos))
+        cur_pos.extend(_protein_labels(i, primary_label, extra_labels))
+        cur_indptr.append(len(cur_pos))
+    
+    # FD matrix column -> cluster position (-1 for clusters not being reassigned)
+    fd_col_pos = np.full(fd_matrix.matrix.shape[1], -1, dtype=np.int64)
+    for cid, pos in cluster_order.items():
+        col = fd_matrix.cluster_index.get(cid)
+        if col is not None:
+            fd_col_pos[col] = pos
+    fd_rows = np.array([fd_matrix.protein_index.get(p, -1) for p in proteins], dtype=np.int64)
+    
+    return (
+        np.array(perm_indptr, dtype=np.int64), np.array(perm_pos, dtype=np.int64),
+        np.array(perm_vals, dtype=np.float64),
+        fd_rows, fd_matrix.matrix.indptr.astype(np.int64), fd_matrix.matrix.indices.astype(np.int64),
+        fd_matrix.matrix.data.astype(np.float64), fd_col_pos,
+        np.array(cur_indptr, dtype=np.int64), np.array(cur_pos, dtype=np.int64),
+        len(cluster_order)
+    )
+
+
+def _slice_membership_inputs(packed_inputs: tuple, start: int, end: int) -> tuple:
+    """
+    Restrict packed membership inputs to proteins[start:end].
+    
+    Index pointers keep their absolute offsets into the shared value arrays,
+    so only the per-protein arrays are sliced.
+    """
+    (perm_indptr, perm_pos, perm_vals, fd_rows, fd_indptr, fd_cols, fd_vals,
+     fd_col_pos, cur_indptr, cur_pos, n_clusters) = packed_inputs
+    return (perm_indptr[start:end + 1], perm_pos, perm_vals, fd_rows[start:end],
+            fd_indptr, fd_cols, fd_vals, fd_col_pos,
+            cur_indptr[start:end + 1], cur_pos, n_clusters)
+
+
+# Packed membership inputs and parameters of a worker process, set once by
+# _init_overlap_worker
+_worker_inputs = None
+
+
+def _init_overlap_worker(packed_inputs: tuple, alpha: float, overlap_tau: float):
+    """Process pool initializer: receive the packed inputs once per worker."""
+    global _worker_inputs
+    _worker_inputs = (packed_inputs, alpha, overlap_tau)
+
+
+def _overlap_candidates_task(start: int, end: int) -> tuple:
+    """Process pool task: overlap candidates of proteins[start:end]."""
+    packed_inputs, alpha, overlap_tau = _worker_inputs
+    return _overlap_candidates_kernel(*_slice_membership_inputs(packed_inputs, start, end),
+                                      alpha, overlap_tau)
+
+
+def _overlap_candidates(packed_inputs: tuple, alpha: float, overlap_tau: float,
+                        n_workers: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find the clusters each protein is added to as an overlap.
+    
+    A protein's overlap candidates depend only on its own clusters, which
+    change only when that protein is processed, so they are computed for all
+    proteins up front (in one compiled loop when numba is available). With
+    n_workers > 1 contiguous slices of proteins are scored in worker
+    processes and the results concatenated in order; the shared arrays reach
+    each worker once, through the pool initializer.
+    
+    Args:
+        packed_inputs: Output of _pack_membership_inputs
+        alpha: Membership weight parameter (already clipped to [0, 1])
+        overlap_tau: Minimum membership gain to allow overlap
+        n_workers: Number of worker processes
+        
+    Returns:
+        (offsets, positions, gains): candidates of proteins[i] are the cluster
+        positions positions[offsets[i]:offsets[i+1]] with their membership gains
+    """
+    alpha = float(alpha)
+    overlap_tau = float(overlap_tau)
+    n_proteins = len(packed_inputs[3])
+    if n_workers <= 1 or n_proteins < 2 * n_workers:
+        return _overlap_candidates_kernel(*packed_inputs, alpha, overlap_tau)
+    
+    bounds = np.linspace(0, n_proteins, n_workers + 1).astype(np.int64).tolist()
+    with ProcessPoolExecutor(max_workers=n_workers,
+                             initializer=_init_overlap_worker,
+                             initargs=(packed_inputs, alpha, overlap_tau)) as executor:
+        results = list(executor.map(_overlap_candidates_task, bounds[:-1], bounds[1:]))
+    
+    # Shift each slice's offsets by the candidates found before it
+    offsets = [np.zeros(1, dtype=np.int64)]
+    for slice_offsets, _, _ in results:
+        offsets.append(slice_offsets[1:] + offsets[-1][-1])
+    return (np.concatenate(offsets),
+            np.concatenate([positions for _, positions, _ in results]),
+            np.concatenate([gains for _, _, gains in results]))
+
+
 def apply_overlap_reassignment(clusters: Dict[int, Set[str]],
                                graph: nx.Graph,
                                protein_go_terms: Dict[str, Set[str]],
@@ -184,7 +776,11 @@ def apply_overlap_reassignment(clusters: Dict[int, Set[str]],
                                permanence_scores: Dict[str, Dict[int, float]],
                                alpha: float = 0.5,
                                overlap_tau: float = 0.1,
-                               transfer_tau: float = 0.0) -> Dict[int, Set[str]]:
+                               transfer_tau: float = 0.0,
+                               fd_matrix: Optional[FunctionalDependencyMatrix] = None,
+                               neighbor_sets: Optional[Dict[str, frozenset]] = None,
+                               membership_cache: Optional[dict] = None,
+                               n_workers: int = 1) -> Dict[int, Set[str]]:
     """
     Apply overlapping community reassignment based on membership scores.
     
@@ -201,75 +797,137 @@ def apply_overlap_reassignment(clusters: Dict[int, Set[str]],
         alpha: Membership weight parameter
         overlap_tau: Minimum membership gain to allow overlap
         transfer_tau: Threshold for transfer (Extra-link > Intra-link)
+        fd_matrix: Precomputed normalized FD scores covering all clustered
+                   proteins (computed here if None)
+        neighbor_sets: Precomputed neighbor sets of the graph (built here if None)
+        membership_cache: Optional dict kept by the caller across calls. The
+                          alpha-independent membership inputs are stored in it
+                          and reused while the same clusters, permanence_scores,
+                          go_tfidf and fd_matrix objects are passed (clusters
+                          must not be modified in place in between).
+        n_workers: Number of processes scoring overlap candidates. Transfers
+                   depend on earlier moves and are always applied sequentially.
         
     Returns:
         Updated clusters with overlaps
     """
-    updated_clusters = {cid: proteins.copy() for cid, proteins in clusters.items()}
+    cluster_ids = list(clusters)
+    cluster_order = {cid: i for i, cid in enumerate(cluster_ids)}
+    n_clusters = len(cluster_ids)
+    alpha = max(0.0, min(1.0, alpha))
     
-    # Get all proteins
-    all_proteins = set()
-    for cluster in clusters.values():
-        all_proteins.update(cluster)
+    # Neighbor sets are built once instead of per link count
+    if neighbor_sets is None:
+        neighbor_sets = build_neighbor_sets(graph)
+    
+    # Proteins, FD scores and packed membership inputs only depend on the
+    # inputs below, so they are reused from membership_cache when possible
+    sources = (clusters, permanence_scores, go_tfidf, fd_matrix)
+    cached = membership_cache.get('inputs') if membership_cache is not None else None
+    if cached is not None and all(a is b for a, b in zip(cached[0], sources)):
+        _, proteins, protein_pos, fd_matrix, packed_inputs = cached
+        primary_label, extra_labels = _build_cluster_labels(clusters, protein_pos)
+    else:
+        # Get all proteins
+        all_proteins = set()
+        for cluster in clusters.values():
+            all_proteins.update(cluster)
+        proteins = list(all_proteins)
+        protein_pos = {protein: i for i, protein in enumerate(proteins)}
+        primary_label, extra_labels = _build_cluster_labels(clusters, protein_pos)
+        
+        # FD of every protein for every cluster in one sparse product; FD does not
+        # depend on cluster contents, only on the TF-IDF scores of the cluster
+        if fd_matrix is None:
+            fd_matrix = FunctionalDependencyMatrix(proteins, protein_go_terms, go_tfidf)
+        
+        packed_inputs = _pack_membership_inputs(proteins, primary_label, extra_labels,
+                                                cluster_order, permanence_scores, fd_matrix)
+        if membership_cache is not None:
+            membership_cache['inputs'] = (sources, proteins, protein_pos, fd_matrix,
+                                          packed_inputs)
+    
+    # Neighbor positions of every protein, reused while the graph is unchanged
+    cached = membership_cache.get('neighbors') if membership_cache is not None else None
+    if cached is not None and cached[0] is proteins and cached[1] is neighbor_sets:
+        _, _, nbr_indptr, nbr_indices = cached
+    else:
+        nbr_indptr, nbr_indices = _build_neighbor_positions(proteins, protein_pos, neighbor_sets)
+        if membership_cache is not None:
+            membership_cache['neighbors'] = (proteins, neighbor_sets, nbr_indptr, nbr_indices)
+    
+    has_extra = np.zeros(len(proteins), dtype=bool)
+    has_extra[list(extra_labels)] = True
     
-    logger.info(f"Applying overlap reassignment for {len(all_proteins)} proteins...")
+    logger.info(f"Applying overlap reassignment for {len(proteins)} proteins...")
     
-    for protein in all_proteins:
-        # Find current cluster(s)
-        current_clusters = [cid for cid, cluster in updated_clusters.items() 
-                           if protein in cluster]
+    # Per-move debug messages are only built when debug logging is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+    
+    # Overlap candidates (membership gain > overlap_tau) of all proteins at once
+    offsets, candidate_positions, candidate_gains = _overlap_candidates(
+        packed_inputs, alpha, overlap_tau, n_workers
+    )
+    
+    for i, protein in enumerate(proteins):
+        # Find current cluster(s), in cluster order
+        current_clusters = _protein_labels(i, primary_label, extra_labels)
         
         if not current_clusters:
             continue
         
-        # Calculate membership in current clusters
-        current_memberships = {}
-        for cid in current_clusters:
-            cluster = updated_clusters[cid]
-            memb = calculate_membership(protein, cluster, cid, graph, 
-                                       protein_go_terms, go_tfidf, 
-                                       permanence_scores, alpha)
-            current_memberships[cid] = memb
+        # Add protein to clusters with enough membership gain (overlap)
+        for k in range(offsets[i], offsets[i + 1]):
+            pos = int(candidate_positions[k])
+            extra_labels.setdefault(i, set()).add(pos)
+            has_extra[i] = True
+            if debug:
+                logger.debug("Added %s to cluster %s (gain=%.3f)",
+                             protein, cluster_ids[pos], candidate_gains[k])
         
-        # Check all other clusters for potential overlap
-        for cluster_id, cluster in updated_clusters.items():
-            if cluster_id in current_clusters:
-                continue
-            
-            # Calculate membership if added to this cluster
-            test_cluster = cluster | {protein}
-            memb_if_added = calculate_membership(protein, test_cluster, cluster_id,
-                                               graph, protein_go_terms, go_tfidf,
-                                               permanence_scores, alpha)
-            
-            # Check overlap condition: membership gain > threshold
-            max_current_memb = max(current_memberships.values()) if current_memberships else 0.0
-            membership_gain = memb_if_added - max_current_memb
-            
-            if membership_gain > overlap_tau:
-                # Add protein to this cluster (overlap)
-                updated_clusters[cluster_id].add(protein)
-                logger.debug(f"Added {protein} to cluster {cluster_id} (gain={membership_gain:.3f})")
+        neighbor_set = neighbor_sets.get(protein)
+        if neighbor_set is None:
+            continue  # Not in the graph: no links to compare
+        degree = len(neighbor_set)
+        neighbors = nbr_indices[nbr_indptr[i]:nbr_indptr[i + 1]]
+        counts = _neighbor_label_counts(neighbors, primary_label, extra_labels,
+                                        has_extra, n_clusters)
         
         # Check transfer condition: Extra-link > Intra-link
-        for cid in current_clusters:
-            cluster = updated_clusters[cid]
-            intra_links, extra_links = calculate_intra_extra_links(protein, cluster, graph)
+        for pos in current_clusters:
+            intra_links = int(counts[pos])
+            extra_links = degree - intra_links
             
             if extra_links > intra_links:
-                # Find cluster with maximum external connections
-                emax_cid = find_emax_cluster(protein, updated_clusters, graph)
+                # Find cluster with maximum external connections, skipping the
+                # protein's own clusters (ties go to the first cluster)
+                external = counts.copy()
+                external[_protein_labels(i, primary_label, extra_labels)] = 0
+                emax_pos = int(np.argmax(external))
+                emax_intra = int(external[emax_pos])
                 
-                if emax_cid != -1 and emax_cid != cid:
-                    # Check transfer threshold
-                    emax_cluster = updated_clusters[emax_cid]
-                    emax_intra, emax_extra = calculate_intra_extra_links(protein, emax_cluster, graph)
-                    
-                    if emax_intra > intra_links:  # Transfer improves intra-links
-                        # Transfer protein
-                        updated_clusters[cid].discard(protein)
-                        updated_clusters[emax_cid].add(protein)
-                        logger.debug(f"Transferred {protein} from cluster {cid} to {emax_cid}")
+                # Check transfer threshold
+                if emax_intra > 0 and emax_intra > intra_links:  # Transfer improves intra-links
+                    # Transfer protein
+                    if primary_label[i] == pos:
+                        primary_label[i] = emax_pos
+                    else:
+                        extra_labels[i].discard(pos)
+                        extra_labels[i].add(emax_pos)
+                    if debug:
+                        logger.debug("Transferred %s from cluster %s to %s",
+                                     protein, cluster_ids[pos], cluster_ids[emax_pos])
+                    # A self-loop makes the protein its own neighbor
+                    counts = _neighbor_label_counts(neighbors, primary_label, extra_labels,
+                                                    has_extra, n_clusters)
+    
+    # Emit clusters as sets only once all moves are applied
+    updated_clusters = {cid: set() for cid in cluster_ids}
+    for i, pos in enumerate(primary_label.tolist()):
+        if pos >= 0:
+            updated_clusters[cluster_ids[pos]].add(proteins[i])
+    for i, positions in extra_labels.items():
+        for pos in positions:
+            updated_clusters[cluster_ids[pos]].add(proteins[i])
     
     return updated_clusters
-
@@ -3,62 +3,157 @@ Output generation for community detection results.
 Creates all required CSV files.
 """
 
+import csv
 import logging
 import json
-from typing import Dict, Set
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
 import os
 
+from src.membership_overlap import (
+    calculate_functional_dependency, calculate_intra_extra_links, calculate_membership,
+    precompute_emax
+)
+from src.permanence import get_permanence_column
+
 logger = logging.getLogger(__name__)
 
+# Rows per chunk written by the raw CSV writer
+CSV_CHUNK_ROWS = 10_000
+
+
+def _csv_field(value: str) -> str:
+    """Quote a text field the way DataFrame.to_csv does (QUOTE_MINIMAL)."""
+    if ',' in value or '"' in value or '\n' in value or '\r' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _format_column(column: np.ndarray) -> list:
+    """Text of each value of a column as DataFrame.to_csv writes it."""
+    if column.dtype.kind == 'f':
+        return ['' if value != value else repr(value) for value in column.tolist()]
+    if column.dtype.kind in 'iub':
+        return [str(value) for value in column.tolist()]
+    return [_csv_field(str(value)) for value in column.tolist()]
+
+
+def _write_csv(output_path: str, columns: Dict[str, np.ndarray], fast: bool = True):
+    """
+    Write columns to a CSV file without an index.
+    
+    The fast path formats CSV_CHUNK_ROWS rows at a time into one string and
+    writes it to a buffered file, producing the same text as
+    DataFrame.to_csv (used when fast is False).
+    
+    Args:
+        output_path: Output file path
+        columns: Dict mapping column name to an array of values
+        fast: If False, write with DataFrame.to_csv
+    """
+    if not fast:
+        pd.DataFrame(columns).to_csv(output_path, index=False)
+        return
+    
+    names = list(columns)
+    n_rows = len(columns[names[0]]) if names else 0
+    with open(output_path, 'w', newline='', buffering=1 << 20) as f:
+        f.write(','.join(_csv_field(name) for name in names) + os.linesep)
+        for start in range(0, n_rows, CSV_CHUNK_ROWS):
+            end = min(start + CSV_CHUNK_ROWS, n_rows)
+            fields = [_format_column(columns[name][start:end]) for name in names]
+            f.write(''.join(','.join(row) + os.linesep for row in zip(*fields)))
+
 
-def save_initial_clusters(clusters: Dict[int, Set[str]], output_path: str):
+def save_initial_clusters(clusters: Dict[int, Set[str]], output_path: str, fast: bool = True):
     """
     Save initial MCL clusters to CSV.
     
     Args:
         clusters: Dict mapping cluster_id to set of proteins
         output_path: Output file path
+        fast: If False, write with DataFrame.to_csv instead of the raw writer
     """
     logger.info(f"Saving initial clusters to {output_path}...")
     
-    rows = []
+    # Columns are filled directly instead of building one dict per row
+    total = sum(len(proteins) for proteins in clusters.values())
+    cluster_ids = np.empty(total, dtype=np.int64)
+    protein_ids = np.empty(total, dtype=object)
+    k = 0
     for cluster_id, proteins in clusters.items():
-        for protein in proteins:
-            rows.append({
-                'cluster_id': cluster_id,
-                'protein_id': protein
-            })
+        cluster_ids[k:k + len(proteins)] = cluster_id
+        protein_ids[k:k + len(proteins)] = list(proteins)
+        k += len(proteins)
     
-    df = pd.DataFrame(rows)
-    df.to_csv(output_path, index=False)
-    logger.info(f"Saved {len(rows)} protein-cluster assignments")
+    _write_csv(output_path, {'cluster_id': cluster_ids, 'protein_id': protein_ids}, fast)
+    logger.info(f"Saved {total} protein-cluster assignments")
 
 
-def save_go_term_importance(go_tfidf, output_path: str):
+def save_go_term_importance(go_tfidf, output_path: str, fast: bool = True):
     """
     Save GO term TF-IDF importance scores.
     
     Args:
         go_tfidf: GOTFIDF instance
         output_path: Output file path
+        fast: If False, write with DataFrame.to_csv instead of the raw writer
     """
     logger.info(f"Saving GO term importance to {output_path}...")
     
-    rows = []
     all_scores = go_tfidf.get_all_scores()
     
+    total = sum(len(term_scores) for term_scores in all_scores.values())
+    cluster_ids = np.empty(total, dtype=np.int64)
+    go_terms = np.empty(total, dtype=object)
+    tfidf_scores = np.empty(total, dtype=np.float64)
+    k = 0
     for cluster_id, term_scores in all_scores.items():
-        for go_term, tfidf_score in term_scores.items():
-            rows.append({
-                'cluster_id': cluster_id,
-                'go_term': go_term,
-                'tfidf_score': tfidf_score
-            })
+        n = len(term_scores)
+        cluster_ids[k:k + n] = cluster_id
+        go_terms[k:k + n] = list(term_scores)
+        tfidf_scores[k:k + n] = list(term_scores.values())
+        k += n
     
-    df = pd.DataFrame(rows)
-    df.to_csv(output_path, index=False)
-    logger.info(f"Saved {len(rows)} GO term-cluster scores")
+    _write_csv(output_path, {'cluster_id': cluster_ids, 'go_term': go_terms,
+                             'tfidf_score': tfidf_scores}, fast)
+    logger.info(f"Saved {total} GO term-cluster scores")
+
+
+def precompute_membership(clusters: Dict[int, Set[str]],
+                          graph,
+                          protein_go_terms: Dict[str, Set[str]],
+                          go_tfidf,
+                          permanence_scores: Dict[str, Dict[int, float]],
+                          alpha: float) -> Dict[Tuple[str, int], float]:
+    """
+    Compute the membership of every protein in each of its clusters once.
+    
+    The result can be passed to save_protein_membership and
+    save_optimized_clusters when both write the same clusters with the same
+    alpha.
+    
+    Args:
+        clusters: Dict mapping cluster_id to set of proteins
+        graph: NetworkX graph
+        protein_go_terms: Dict mapping protein ID to GO terms
+        go_tfidf: GOTFIDF instance
+        permanence_scores: Pre-computed permanence scores
+        alpha: Membership weight parameter
+        
+    Returns:
+        Dict mapping (protein_id, cluster_id) to membership score
+    """
+    return {
+        (protein, cluster_id): calculate_membership(
+            protein, cluster, cluster_id, graph,
+            protein_go_terms, go_tfidf, permanence_scores, alpha
+        )
+        for cluster_id, cluster in clusters.items()
+        for protein in cluster
+    }
 
 
 def save_protein_membership(clusters: Dict[int, Set[str]],
@@ -67,7 +162,9 @@ def save_protein_membership(clusters: Dict[int, Set[str]],
                             go_tfidf,
                             permanence_scores: Dict[str, Dict[int, float]],
                             alpha: float,
-                            output_path: str):
+                            output_path: str,
+                            memberships: Optional[Dict[Tuple[str, int], float]] = None,
+                            fast: bool = True):
     """
     Save protein membership details.
     
@@ -79,52 +176,71 @@ def save_protein_membership(clusters: Dict[int, Set[str]],
         permanence_scores: Pre-computed permanence scores
         alpha: Membership weight parameter
         output_path: Output file path
+        memberships: Optional output of precompute_membership for these
+                     clusters and alpha (computed here if None)
+        fast: If False, write with DataFrame.to_csv instead of the raw writer
     """
     logger.info(f"Saving protein membership to {output_path}...")
     
-    from src.membership_overlap import (
-        calculate_membership, calculate_intra_extra_links,
-        find_emax_cluster
-    )
+    if memberships is None:
+        memberships = precompute_membership(clusters, graph, protein_go_terms, go_tfidf,
+                                            permanence_scores, alpha)
+    
+    # E_max does not depend on the cluster being written, only on the protein
+    emax_map = precompute_emax(clusters, graph)
     
-    rows = []
+    # Columns are filled by index instead of building one dict per row
+    total = sum(len(cluster) for cluster in clusters.values())
+    protein_ids = np.empty(total, dtype=object)
+    cluster_ids = np.empty(total, dtype=np.int64)
+    perm_col = np.empty(total, dtype=np.float64)
+    fd_col = np.empty(total, dtype=np.float64)
+    membership_col = np.empty(total, dtype=np.float64)
+    intra_col = np.empty(total, dtype=np.int64)
+    extra_col = np.empty(total, dtype=np.int64)
+    emax_col = np.empty(total, dtype=np.int64)
+    k = 0
     
     for cluster_id, cluster in clusters.items():
+        # Permanence of the whole cluster in one lookup
+        perm_col[k:k + len(cluster)] = get_permanence_column(permanence_scores, list(cluster),
+                                                             cluster_id)
+        
         for protein in cluster:
             # Calculate all metrics
-            perm = permanence_scores.get(protein, {}).get(cluster_id, 0.0)
-            
             fd = 0.0
             if protein in protein_go_terms:
-                from src.membership_overlap import calculate_functional_dependency
                 fd = calculate_functional_dependency(
                     protein, cluster, protein_go_terms, go_tfidf, cluster_id
                 )
             
-            membership = calculate_membership(
-                protein, cluster, cluster_id, graph,
-                protein_go_terms, go_tfidf, permanence_scores, alpha
-            )
+            membership = memberships[(protein, cluster_id)]
             
             intra, extra = calculate_intra_extra_links(protein, cluster, graph)
             
             # Find E_max cluster
-            emax_cid = find_emax_cluster(protein, clusters, graph)
+            emax_cid = emax_map[protein]
             
-            rows.append({
-                'protein_id': protein,
-                'cluster_id': cluster_id,
-                'permanence': perm,
-                'fd': fd,
-                'membership': membership,
-                'intra': intra,
-                'extra': extra,
-                'emax': emax_cid
-            })
-    
-    df = pd.DataFrame(rows)
-    df.to_csv(output_path, index=False)
-    logger.info(f"Saved {len(rows)} protein membership records")
+            protein_ids[k] = protein
+            cluster_ids[k] = cluster_id
+            fd_col[k] = fd
+            membership_col[k] = membership
+            intra_col[k] = intra
+            extra_col[k] = extra
+            emax_col[k] = emax_cid
+            k += 1
+    
+    _write_csv(output_path, {
+        'protein_id': protein_ids,
+        'cluster_id': cluster_ids,
+        'permanence': perm_col,
+        'fd': fd_col,
+        'membership': membership_col,
+        'intra': intra_col,
+        'extra': extra_col,
+        'emax': emax_col
+    }, fast)
+    logger.info(f"Saved {total} protein membership records")
 
 
 def save_optimized_clusters(clusters: Dict[int, Set[str]], 
@@ -133,7 +249,9 @@ def save_optimized_clusters(clusters: Dict[int, Set[str]],
                            go_tfidf,
                            graph,
                            alpha: float,
-                           output_path: str):
+                           output_path: str,
+                           memberships: Optional[Dict[Tuple[str, int], float]] = None,
+                           fast: bool = True):
     """
     Save optimized clusters with membership scores.
     
@@ -145,63 +263,70 @@ def save_optimized_clusters(clusters: Dict[int, Set[str]],
         graph: NetworkX graph
         alpha: Membership weight parameter
         output_path: Output file path
+        memberships: Optional output of precompute_membership for these
+                     clusters and alpha (computed here if None)
+        fast: If False, write with DataFrame.to_csv instead of the raw writer
     """
     logger.info(f"Saving optimized clusters to {output_path}...")
     
-    import sys
-    from pathlib import Path
-    sys.path.insert(0, str(Path(__file__).parent.parent))
-    from src.membership_overlap import calculate_membership
+    if memberships is None:
+        memberships = precompute_membership(clusters, graph, protein_go_terms, go_tfidf,
+                                            permanence_scores, alpha)
     
-    rows = []
+    total = sum(len(cluster) for cluster in clusters.values())
+    cluster_ids = np.empty(total, dtype=np.int64)
+    protein_ids = np.empty(total, dtype=object)
+    membership_scores = np.empty(total, dtype=np.float64)
+    k = 0
     
     for cluster_id, cluster in clusters.items():
         for protein in cluster:
-            membership = calculate_membership(
-                protein, cluster, cluster_id, graph,
-                protein_go_terms, go_tfidf, permanence_scores, alpha
-            )
-            
-            rows.append({
-                'cluster_id': cluster_id,
-                'protein_id': protein,
-                'membership_score': membership
-            })
+            cluster_ids[k] = cluster_id
+            protein_ids[k] = protein
+            membership_scores[k] = memberships[(protein, cluster_id)]
+            k += 1
     
-    df = pd.DataFrame(rows)
-    df.to_csv(output_path, index=False)
-    logger.info(f"Saved {len(rows)} optimized cluster assignments")
+    _write_csv(output_path, {'cluster_id': cluster_ids, 'protein_id': protein_ids,
+                             'membership_score': membership_scores}, fast)
+    logger.info(f"Saved {total} optimized cluster assignments")
 
 
-def save_overlap_summary(clusters: Dict[int, Set[str]], output_path: str):
+def save_overlap_summary(clusters: Dict[int, Set[str]], output_path: str, fast: bool = True):
     """
     Save overlap summary.
     
     Args:
         clusters: Dict mapping cluster_id to set of proteins
         output_path: Output file path
+        fast: If False, write with DataFrame.to_csv instead of the raw writer
     """
     logger.info(f"Saving overlap summary to {output_path}...")
     
     # Build protein -> clusters mapping
-    protein_clusters = {}
+    protein_clusters = defaultdict(list)
     for cluster_id, cluster in clusters.items():
         for protein in cluster:
-            if protein not in protein_clusters:
-                protein_clusters[protein] = []
             protein_clusters[protein].append(cluster_id)
     
-    rows = []
-    for protein, cluster_ids in protein_clusters.items():
-        rows.append({
-            'protein_id': protein,
-            'num_clusters': len(cluster_ids),
-            'clusters_json': json.dumps(cluster_ids)
-        })
-    
-    df = pd.DataFrame(rows)
-    df.to_csv(output_path, index=False)
-    logger.info(f"Saved overlap summary for {len(rows)} proteins")
+    if not fast:
+        _write_csv(output_path, {
+            'protein_id': np.array(list(protein_clusters), dtype=object),
+            'num_clusters': np.array([len(cids) for cids in protein_clusters.values()],
+                                     dtype=np.int64),
+            'clusters_json': np.array([json.dumps(cids) for cids in protein_clusters.values()],
+                                      dtype=object)
+        }, fast)
+    else:
+        # Rows are streamed straight from the mapping; the JSON list of
+        # integer cluster IDs is built by hand in json.dumps' format
+        with open(output_path, 'w', newline='', buffering=1 << 20) as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(['protein_id', 'num_clusters', 'clusters_json'])
+            writer.writerows(
+                (protein, len(cids), '[' + ', '.join(map(str, cids)) + ']')
+                for protein, cids in protein_clusters.items()
+            )
+    logger.info(f"Saved overlap summary for {len(protein_clusters)} proteins")
 
 
 def save_evaluation_results(evaluation_df: pd.DataFrame, output_path: str):
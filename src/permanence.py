@@ -7,14 +7,24 @@ internal vs external connections.
 """
 
 import logging
-from typing import Dict, Set
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
 import networkx as nx
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to NumPy
+    njit = None
+
 logger = logging.getLogger(__name__)
 
 
 def calculate_permanence(protein: str, cluster: Set[str], graph: nx.Graph,
-                         all_clusters: Dict[int, Set[str]] = None) -> float:
+                         all_clusters: Dict[int, Set[str]] = None,
+                         E_max_p: Optional[int] = None) -> float:
     """
     Calculate permanence for a protein in a cluster (Eq.1).
     
@@ -33,6 +43,7 @@ def calculate_permanence(protein: str, cluster: Set[str], graph: nx.Graph,
         cluster: Set of protein IDs in the cluster
         graph: NetworkX graph
         all_clusters: Dict mapping cluster_id to set of proteins (for E_max calculation)
+        E_max_p: Precomputed E_max(p); all_clusters is not scanned when given
         
     Returns:
         Permanence score in range [-1, 1]
@@ -49,48 +60,93 @@ def calculate_permanence(protein: str, cluster: Set[str], graph: nx.Graph,
     I_p = len(internal_neighbors)
     
     # External connections: neighbors not in this cluster
-    external_neighbors = neighbors - cluster
+    n_external = len(neighbors) - I_p
     
-    if not external_neighbors:
+    if not n_external:
         # No external connections - fully internal
-        if I_p > 0:
-            # Normalize to ensure range [-1, 1]
-            # With no external connections, permanence should be positive
-            return 1.0
-        return 0.0
+        # Normalize to ensure range [-1, 1]
+        # With no external connections, permanence should be positive
+        return 1.0
+    
+    if I_p == 0:
+        # No internal connections: I(p) / E_max(p) and C_in(p) are both 0
+        # whatever E_max(p) is, so the cluster scan is skipped
+        return -1.0
     
     # E_max: maximum external connections to any single OTHER cluster
     # This requires knowledge of all clusters
-    E_max_p = 0
-    if all_clusters is not None:
-        for cluster_id, other_cluster in all_clusters.items():
-            if other_cluster == cluster:
-                continue  # Skip the current cluster
-            connections = len(neighbors & other_cluster)
-            if connections > E_max_p:
-                E_max_p = connections
-    else:
-        # Fallback: use total external neighbors (upper bound)
-        E_max_p = len(external_neighbors)
+    if E_max_p is None:
+        if all_clusters is not None:
+            E_max_p = _max_external_connections(neighbors, cluster, all_clusters)
+        else:
+            # Fallback: use total external neighbors (upper bound)
+            E_max_p = n_external
     
     # Clustering coefficient of internal neighbors
     # C_in(p) = fraction of edges between internal neighbors
     if I_p < 2:
         C_in_p = 0.0
     else:
-        internal_edges = 0
-        internal_list = list(internal_neighbors)
-        for i, n1 in enumerate(internal_list):
-            for n2 in internal_list[i+1:]:
-                if graph.has_edge(n1, n2):
-                    internal_edges += 1
+        internal_edges = _internal_edge_count_sets(internal_neighbors, graph)
         max_possible = I_p * (I_p - 1) / 2
         C_in_p = internal_edges / max_possible if max_possible > 0 else 0.0
     
+    return _permanence_from_counts(I_p, len(neighbors), E_max_p, C_in_p)
+
+
+def _max_external_connections(neighbors: Set[str], cluster: Set[str],
+                              all_clusters: Dict[int, Set[str]]) -> int:
+    """
+    E_max(p): most neighbors of a protein in any single cluster other than cluster.
+    
+    Clusters with the same proteins as cluster are skipped as well.
+    """
+    E_max_p = 0
+    for cluster_id, other_cluster in all_clusters.items():
+        if other_cluster == cluster:
+            continue  # Skip the current cluster
+        connections = len(neighbors & other_cluster)
+        if connections > E_max_p:
+            E_max_p = connections
+    return E_max_p
+
+
+def _internal_edge_count_sets(internal_neighbors: Set[str], graph: nx.Graph) -> int:
+    """
+    Number of edges among a set of nodes, walking each node's adjacency once.
+    
+    Set counterpart of _internal_edge_count: O(sum of degrees) instead of
+    testing every pair with has_edge.
+    """
+    adj = graph._adj
+    seen = 0
+    selfloops = 0
+    for node in internal_neighbors:
+        node_adj = adj[node]
+        seen += len(node_adj.keys() & internal_neighbors)
+        if node in node_adj:
+            selfloops += 1
+    # Each edge is seen from both ends, a self-loop only once (not a pair)
+    return (seen - selfloops) // 2
+
+
+def _permanence_from_counts(I_p: int, degree: int, E_max_p: int, C_in_p: float) -> float:
+    """
+    Eq.1 from the link counts of a protein that has external neighbors.
+    
+    Args:
+        I_p: Internal connections
+        degree: Number of neighbors
+        E_max_p: Maximum external connections to any single other cluster
+        C_in_p: Clustering coefficient of internal neighbors
+        
+    Returns:
+        Permanence score in range [-1, 1]
+    """
     # Calculate permanence (Eq.1)
     if E_max_p == 0:
         # No external connections to any cluster
-        permanence = (I_p / max(1, len(neighbors))) - (1 - C_in_p)
+        permanence = (I_p / max(1, degree)) - (1 - C_in_p)
     else:
         permanence = (I_p / E_max_p) - (1 - C_in_p)
     
@@ -104,20 +160,480 @@ def calculate_permanence(protein: str, cluster: Set[str], graph: nx.Graph,
     return permanence_normalized
 
 
+def csr_adjacency(graph: nx.Graph) -> Tuple[Dict[str, int], np.ndarray, np.ndarray]:
+    """
+    Build the adjacency of the graph in CSR form with sorted neighbor indices.
+    
+    Args:
+        graph: NetworkX graph
+        
+    Returns:
+        (node_index, indptr, indices): neighbors of the node with index i are
+        indices[indptr[i]:indptr[i+1]]
+    """
+    adj = graph._adj
+    n_nodes = len(adj)
+    node_index = {node: i for i, node in enumerate(adj)}
+    degrees = np.fromiter(map(len, adj.values()), dtype=np.int64, count=n_nodes)
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    indices = np.fromiter(map(node_index.__getitem__, chain.from_iterable(adj.values())),
+                          dtype=np.int64, count=indptr[-1])
+    
+    # Sort each row in one pass: offsetting row i by i * n_nodes keeps rows
+    # apart while the whole array is sorted
+    row_offsets = np.repeat(np.arange(n_nodes, dtype=np.int64) * n_nodes, degrees)
+    indices += row_offsets
+    indices.sort()
+    indices -= row_offsets
+    return node_index, indptr, indices
+
+
+def _gather_ranges(indptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of the entries of several CSR rows, concatenated.
+    
+    Args:
+        indptr: CSR index pointer
+        rows: Rows to gather
+        
+    Returns:
+        (positions, lengths): entry positions and the length of each row
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths), lengths
+
+
+def _internal_edge_count(internal: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                         has_selfloop: np.ndarray, scratch: np.ndarray) -> int:
+    """
+    Number of edges among the internal neighbors of a node.
+    
+    Args:
+        internal: Indices of the internal neighbors
+        indptr, indices: CSR adjacency (see csr_adjacency)
+        has_selfloop: Boolean mask of nodes with a self-loop
+        scratch: All-False boolean array of length n_nodes, restored on return
+        
+    Returns:
+        Number of distinct pairs of internal neighbors joined by an edge
+    """
+    # Neighbors of all internal neighbors in one gather
+    positions, _ = _gather_ranges(indptr, internal)
+    
+    scratch[internal] = True
+    seen = int(np.count_nonzero(scratch[indices[positions]]))
+    scratch[internal] = False
+    
+    # Each edge between internal neighbors is seen from both ends, a
+    # self-loop only once (and does not count as a pair)
+    return (seen - int(np.count_nonzero(has_selfloop[internal]))) // 2
+
+
+def _permanence_loop(rows, pc_indptr, pc_pos, indptr, indices, has_selfloop,
+                     nc_indptr, nc_pos, canon, n_clusters):
+    """
+    Permanence of every (protein, cluster) pair in one pass over CSR arrays.
+    
+    Loop form for compilation with numba. Each protein's neighbors are
+    tallied per cluster once, which gives I(p) for all of its clusters and
+    E_max(p) from the same counts.
+    
+    Args:
+        rows: Node index of each protein (-1 if not in the graph)
+        pc_indptr, pc_pos: Cluster positions of each protein, in output order
+        indptr, indices: CSR adjacency (see csr_adjacency)
+        has_selfloop: Boolean mask of nodes with a self-loop
+        nc_indptr, nc_pos: Cluster positions of each node
+        canon: Position of the first cluster with the same proteins as each cluster
+        n_clusters: Number of clusters
+        
+    Returns:
+        Scores aligned with pc_pos
+    """
+    scores = np.zeros(len(pc_pos))
+    counts = np.zeros(n_clusters, dtype=np.int64)
+    touched = np.empty(n_clusters, dtype=np.int64)
+    mark = np.zeros(len(indptr) - 1, dtype=np.bool_)
+    
+    for p in range(len(rows)):
+        i = rows[p]
+        if i < 0:
+            continue
+        degree = indptr[i + 1] - indptr[i]
+        if degree == 0:
+            continue
+        
+        # Neighbors of the protein per cluster
+        n_touched = 0
+        for k in range(indptr[i], indptr[i + 1]):
+            n = indices[k]
+            for m in range(nc_indptr[n], nc_indptr[n + 1]):
+                c = nc_pos[m]
+                if counts[c] == 0:
+                    touched[n_touched] = c
+                    n_touched += 1
+                counts[c] += 1
+        
+        for q in range(pc_indptr[p], pc_indptr[p + 1]):
+            c = pc_pos[q]
+            I_p = counts[c]
+            if I_p == degree:
+                # No external connections - fully internal
+                scores[q] = 1.0
+                continue
+            if I_p == 0:
+                # No internal connections - -1 whatever E_max(p) is
+                scores[q] = -1.0
+                continue
+            
+            E_max_p = 0
+            for t in range(n_touched):
+                other = touched[t]
+                if canon[other] != canon[c] and counts[other] > E_max_p:
+                    E_max_p = counts[other]
+            
+            C_in_p = 0.0
+            if I_p >= 2:
+                # Mark internal neighbors, then count edges among them
+                for k in range(indptr[i], indptr[i + 1]):
+                    n = indices[k]
+                    for m in range(nc_indptr[n], nc_indptr[n + 1]):
+                        if nc_pos[m] == c:
+                            mark[n] = True
+                seen = 0
+                for k in range(indptr[i], indptr[i + 1]):
+                    j = indices[k]
+                    if mark[j]:
+                        for l in range(indptr[j], indptr[j + 1]):
+                            if mark[indices[l]]:
+                                seen += 1
+                        if has_selfloop[j]:
+                            seen -= 1
+                for k in range(indptr[i], indptr[i + 1]):
+                    mark[indices[k]] = False
+                C_in_p = (seen // 2) / (I_p * (I_p - 1) / 2)
+            
+            if E_max_p == 0:
+                permanence = I_p / degree - (1 - C_in_p)
+            else:
+                permanence = I_p / E_max_p - (1 - C_in_p)
+            scores[q] = min(max(permanence, -1.0), 1.0)
+        
+        for t in range(n_touched):
+            counts[touched[t]] = 0
+    
+    return scores
+
+
+def _permanence_numpy(rows, pc_indptr, pc_pos, indptr, indices, has_selfloop,
+                      nc_indptr, nc_pos, canon, n_clusters):
+    """
+    Permanence of every (protein, cluster) pair, one protein at a time.
+    
+    Same inputs and result as _permanence_loop. The clusters of all of a
+    protein's neighbors are gathered at once, and one histogram of them gives
+    I(p) for each of its clusters and E_max(p).
+    """
+    scores = np.zeros(len(pc_pos))
+    scratch = np.zeros(len(indptr) - 1, dtype=bool)
+    for p in range(len(rows)):
+        i = rows[p]
+        if i < 0:
+            continue
+        neighbors = indices[indptr[i]:indptr[i + 1]]
+        degree = len(neighbors)
+        if degree == 0:
+            continue
+        
+        # Cluster of every (neighbor, cluster) membership, tallied per cluster
+        positions, lengths = _gather_ranges(nc_indptr, neighbors)
+        entry_clusters = nc_pos[positions]
+        entry_nodes = np.repeat(neighbors, lengths)
+        counts = np.bincount(entry_clusters, minlength=n_clusters)
+        
+        for q in range(pc_indptr[p], pc_indptr[p + 1]):
+            c = pc_pos[q]
+            I_p = int(counts[c])
+            if I_p == degree:
+                # No external connections - fully internal
+                scores[q] = 1.0
+                continue
+            if I_p == 0:
+                # No internal connections - -1 whatever E_max(p) is
+                scores[q] = -1.0
+                continue
+            
+            E_max_p = int(np.where(canon == canon[c], 0, counts).max())
+            C_in_p = 0.0
+            if I_p >= 2:
+                internal = entry_nodes[entry_clusters == c]
+                internal_edges = _internal_edge_count(internal, indptr, indices,
+                                                      has_selfloop, scratch)
+                C_in_p = internal_edges / (I_p * (I_p - 1) / 2)
+            scores[q] = _permanence_from_counts(I_p, degree, E_max_p, C_in_p)
+    
+    return scores
+
+
+if njit is not None:
+    _permanence_kernel = njit(cache=True)(_permanence_loop)
+else:
+    _permanence_kernel = _permanence_numpy
+
+
+def _pack_permanence_inputs(clusters: Dict[int, Set[str]], graph: nx.Graph,
+                            protein_clusters: Dict[str, List[int]]) -> tuple:
+    """
+    Pack the graph and cluster memberships into CSR-style arrays.
+    
+    Args:
+        clusters: Dict mapping cluster_id to set of protein IDs
+        graph: NetworkX graph
+        protein_clusters: Dict mapping protein ID to the IDs of its clusters
+        
+    Returns:
+        Arguments of _permanence_kernel
+    """
+    node_index, indptr, indices = csr_adjacency(graph)
+    n_nodes = len(node_index)
+    node_rows = np.repeat(np.arange(n_nodes), np.diff(indptr))
+    has_selfloop = np.zeros(n_nodes, dtype=bool)
+    has_selfloop[node_rows[node_rows == indices]] = True
+    
+    # Clusters with the same proteins share a canonical position, so E_max
+    # skips them like the current cluster
+    cluster_order = {cid: pos for pos, cid in enumerate(clusters)}
+    first_position = {}
+    canon = np.array([first_position.setdefault(frozenset(cluster), pos)
+                      for pos, cluster in enumerate(clusters.values())], dtype=np.int64)
+    
+    # Cluster positions of each graph node and of each protein (output order)
+    node_clusters = [[] for _ in range(n_nodes)]
+    rows = np.full(len(protein_clusters), -1, dtype=np.int64)
+    pc_indptr = [0]
+    pc_pos = []
+    for p, (protein, cluster_ids) in enumerate(protein_clusters.items()):
+        positions = [cluster_order[cid] for cid in cluster_ids]
+        i = node_index.get(protein)
+        if i is not None:
+            rows[p] = i
+            node_clusters[i] = positions
+        pc_pos.extend(positions)
+        pc_indptr.append(len(pc_pos))
+    nc_indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    nc_indptr[1:] = np.cumsum([len(positions) for positions in node_clusters])
+    nc_pos = np.fromiter((pos for positions in node_clusters for pos in positions),
+                         dtype=np.int64, count=nc_indptr[-1])
+    
+    return (rows, np.array(pc_indptr, dtype=np.int64), np.array(pc_pos, dtype=np.int64),
+            indptr, indices, has_selfloop, nc_indptr, nc_pos, canon, len(cluster_order))
+
+
+def _slice_permanence_inputs(packed_inputs: tuple, start: int, end: int) -> tuple:
+    """
+    Restrict packed permanence inputs to proteins start:end.
+    
+    The protein -> cluster positions are rebased so the slice's scores come
+    out as a contiguous block of the full result.
+    """
+    (rows, pc_indptr, pc_pos, indptr, indices, has_selfloop,
+     nc_indptr, nc_pos, canon, n_clusters) = packed_inputs
+    return (rows[start:end], pc_indptr[start:end + 1] - pc_indptr[start],
+            pc_pos[pc_indptr[start]:pc_indptr[end]], indptr, indices, has_selfloop,
+            nc_indptr, nc_pos, canon, n_clusters)
+
+
+# Packed permanence inputs of a worker process, set once by _init_permanence_worker
+_worker_inputs = None
+
+
+def _init_permanence_worker(packed_inputs: tuple):
+    """Process pool initializer: receive the packed inputs once per worker."""
+    global _worker_inputs
+    _worker_inputs = packed_inputs
+
+
+def _permanence_task(start: int, end: int) -> np.ndarray:
+    """Process pool task: permanence scores of proteins start:end."""
+    return _permanence_kernel(*_slice_permanence_inputs(_worker_inputs, start, end))
+
+
+def _permanence_scores(packed_inputs: tuple, n_workers: int = 1) -> np.ndarray:
+    """
+    Run _permanence_kernel, split over worker processes when n_workers > 1.
+    
+    Proteins are scored independently, so contiguous slices of them are
+    scored in separate processes and the results concatenated in order.
+    The shared arrays reach each worker once, through the pool initializer.
+    
+    Args:
+        packed_inputs: Output of _pack_permanence_inputs
+        n_workers: Number of worker processes
+        
+    Returns:
+        Scores aligned with the packed protein -> cluster positions
+    """
+    n_proteins = len(packed_inputs[0])
+    if n_workers <= 1 or n_proteins < 2 * n_workers:
+        return _permanence_kernel(*packed_inputs)
+    
+    bounds = np.linspace(0, n_proteins, n_workers + 1).astype(np.int64).tolist()
+    with ProcessPoolExecutor(max_workers=n_workers,
+                             initializer=_init_permanence_worker,
+                             initargs=(packed_inputs,)) as executor:
+        return np.concatenate(list(executor.map(_permanence_task, bounds[:-1], bounds[1:])))
+
+
+class PermanenceScores(Mapping):
+    """
+    Permanence scores of all proteins, stored in flat arrays.
+    
+    Read-only mapping of protein ID -> {cluster_id: score}, so it can stand
+    in for the nested dicts. The scores of the protein with index k are
+    values[indptr[k]:indptr[k+1]], for the clusters in the same slice of
+    cluster_ids. This avoids a dict and a float object per score.
+    """
+    
+    def __init__(self, protein_index: Dict[str, int], indptr: np.ndarray,
+                 cluster_ids: np.ndarray, values: np.ndarray):
+        """
+        Wrap packed permanence scores.
+        
+        Args:
+            protein_index: Dict mapping protein ID to its row
+            indptr: Row pointer into cluster_ids and values
+            cluster_ids: Cluster ID of each score
+            values: Permanence scores
+        """
+        self.protein_index = protein_index
+        self.indptr = indptr
+        self.cluster_ids = cluster_ids
+        self.values = values
+    
+    def __getitem__(self, protein: str) -> Dict[int, float]:
+        k = self.protein_index[protein]
+        start, end = self.indptr[k], self.indptr[k + 1]
+        return dict(zip(self.cluster_ids[start:end].tolist(), self.values[start:end].tolist()))
+    
+    def __iter__(self):
+        return iter(self.protein_index)
+    
+    def __len__(self) -> int:
+        return len(self.protein_index)
+    
+    def __contains__(self, protein) -> bool:
+        return protein in self.protein_index
+    
+    def score(self, protein: str, cluster_id: int, default: float = 0.0) -> float:
+        """
+        Get the permanence of one protein in one cluster.
+        
+        Args:
+            protein: Protein ID
+            cluster_id: Cluster ID
+            default: Value for unknown proteins or clusters
+            
+        Returns:
+            Permanence score
+        """
+        k = self.protein_index.get(protein)
+        if k is None:
+            return default
+        start, end = self.indptr[k], self.indptr[k + 1]
+        for q in range(start, end):
+            if self.cluster_ids[q] == cluster_id:
+                return float(self.values[q])
+        return default
+    
+    def lookup(self, proteins: List[str], cluster_id: int, default: float = 0.0) -> np.ndarray:
+        """
+        Get the permanence of several proteins in one cluster.
+        
+        Args:
+            proteins: Protein IDs
+            cluster_id: Cluster ID
+            default: Value for unknown proteins or clusters
+            
+        Returns:
+            Scores aligned with proteins
+        """
+        rows = np.fromiter((self.protein_index.get(p, -1) for p in proteins),
+                           dtype=np.int64, count=len(proteins))
+        result = np.full(len(rows), default)
+        known = np.flatnonzero(rows >= 0)
+        starts = self.indptr[rows[known]]
+        ends = self.indptr[rows[known] + 1]
+        
+        # Rows hold a handful of clusters: scan them column by column for
+        # every protein at once
+        max_length = int((ends - starts).max()) if len(known) else 0
+        for offset in range(max_length):
+            q = starts + offset
+            in_row = q < ends
+            hit = in_row.copy()
+            hit[in_row] = self.cluster_ids[q[in_row]] == cluster_id
+            result[known[hit]] = self.values[q[hit]]
+        return result
+
+
+def get_permanence(permanence_scores: Mapping, protein: str, cluster_id: int,
+                   default: float = 0.0) -> float:
+    """
+    Permanence of a protein in a cluster from PermanenceScores or nested dicts.
+    
+    Args:
+        permanence_scores: PermanenceScores or dict of protein -> {cluster_id: score}
+        protein: Protein ID
+        cluster_id: Cluster ID
+        default: Value for unknown proteins or clusters
+        
+    Returns:
+        Permanence score
+    """
+    if isinstance(permanence_scores, PermanenceScores):
+        return permanence_scores.score(protein, cluster_id, default)
+    return permanence_scores.get(protein, {}).get(cluster_id, default)
+
+
+def get_permanence_column(permanence_scores: Mapping, proteins: List[str],
+                          cluster_id: int, default: float = 0.0) -> np.ndarray:
+    """
+    Permanence of several proteins in one cluster, as an array.
+    
+    Args:
+        permanence_scores: PermanenceScores or dict of protein -> {cluster_id: score}
+        proteins: Protein IDs
+        cluster_id: Cluster ID
+        default: Value for unknown proteins or clusters
+        
+    Returns:
+        Scores aligned with proteins
+    """
+    if isinstance(permanence_scores, PermanenceScores):
+        return permanence_scores.lookup(proteins, cluster_id, default)
+    return np.array([permanence_scores.get(p, {}).get(cluster_id, default) for p in proteins],
+                    dtype=np.float64)
+
+
 def calculate_permanence_all_proteins(clusters: Dict[int, Set[str]], 
-                                      graph: nx.Graph) -> Dict[str, Dict[int, float]]:
+                                      graph: nx.Graph,
+                                      n_workers: int = 1,
+                                      dtype=np.float64) -> PermanenceScores:
     """
     Calculate permanence for all proteins in all clusters.
     
     Args:
         clusters: Dict mapping cluster_id to set of protein IDs
         graph: NetworkX graph
+        n_workers: Number of processes scoring proteins in parallel
+        dtype: Dtype the scores are stored in (np.float32 halves their memory)
         
     Returns:
-        Dict mapping protein_id to dict of cluster_id -> permanence score
+        PermanenceScores mapping protein_id to dict of cluster_id -> permanence score
     """
-    permanence_scores = {}
-    
     # Build reverse mapping: protein -> clusters it belongs to
     protein_clusters = {}
     for cluster_id, proteins in clusters.items():
@@ -126,14 +642,14 @@ def calculate_permanence_all_proteins(clusters: Dict[int, Set[str]],
                 protein_clusters[protein] = []
             protein_clusters[protein].append(cluster_id)
     
-    # Calculate permanence for each protein in each cluster
-    # Pass all_clusters to properly compute E_max
-    for protein, cluster_ids in protein_clusters.items():
-        permanence_scores[protein] = {}
-        for cluster_id in cluster_ids:
-            cluster = clusters[cluster_id]
-            perm = calculate_permanence(protein, cluster, graph, all_clusters=clusters)
-            permanence_scores[protein][cluster_id] = perm
+    # Calculate permanence for each protein in each cluster; E_max of each
+    # protein comes from one tally of its neighbors' clusters
+    packed_inputs = _pack_permanence_inputs(clusters, graph, protein_clusters)
+    scores = _permanence_scores(packed_inputs, n_workers)
     
-    return permanence_scores
-
+    # Scores are laid out protein by protein, like the packed cluster positions
+    pc_indptr = packed_inputs[1]
+    cluster_ids = np.fromiter(chain.from_iterable(protein_clusters.values()),
+                              dtype=np.int64, count=pc_indptr[-1])
+    protein_index = {protein: k for k, protein in enumerate(protein_clusters)}
+    return PermanenceScores(protein_index, pc_indptr, cluster_ids, scores.astype(dtype, copy=False))
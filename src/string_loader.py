@@ -4,15 +4,75 @@ Supports both download mode (parsing files) and REST API mode.
 """
 
 import os
-import gzip
+import sys
+import csv
+import json
 import logging
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations_with_replacement
 from typing import Dict, Set, Tuple, Optional
+import numpy as np
 import networkx as nx
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:  # pyarrow is optional; the parsed network is then not cached
+    PARQUET_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Parquet schema metadata key recording what a cached network was parsed from
+CACHE_SOURCES_KEY = b"string_sources"
+
+# Rows of the STRING links and aliases files parsed per chunk
+LINKS_CHUNK_ROWS = 1_000_000
+
+# Alias sources mapped to UniProt IDs
+UNIPROT_SOURCES = ["UniProt_AC", "UniProt_ID"]
+
+# Identifiers per chunk (a STRING API network request covers a pair of
+# chunks), and concurrent requests
+API_CHUNK_SIZE = 100
+API_MAX_WORKERS = 4
+
+
+def _encode_proteins(proteins: np.ndarray, protein_aliases: Dict[str, str],
+                     node_codes: Dict[str, int]) -> np.ndarray:
+    """
+    Map STRING IDs to integer node codes, via their UniProt alias if any.
+    
+    Args:
+        proteins: Array of STRING IDs
+        protein_aliases: Dict mapping STRING IDs to UniProt IDs
+        node_codes: Dict mapping node name to code, extended with new names
+        
+    Returns:
+        Array of node codes
+    """
+    # Aliases are looked up once per distinct ID rather than once per row.
+    # Node names are interned, so they are shared with GO annotations.
+    codes, uniques = pd.factorize(proteins)
+    unique_codes = np.array(
+        [node_codes.setdefault(sys.intern(protein_aliases.get(p, p)), len(node_codes))
+         for p in uniques],
+        dtype=np.int64
+    )
+    return unique_codes[codes]
+
+
+def _edges_to_graph(edges: pd.DataFrame) -> nx.Graph:
+    """Build a weighted graph from an edge list, adding edges in row order."""
+    graph = nx.Graph()
+    graph.add_weighted_edges_from(zip(edges['source'].tolist(),
+                                      edges['target'].tolist(),
+                                      edges['weight'].tolist()))
+    return graph
+
 
 class STRINGLoader:
     """
@@ -36,6 +96,10 @@ class STRINGLoader:
         self.threshold = threshold
         os.makedirs(cache_dir, exist_ok=True)
         
+        # API sessions, one per thread (requests.Session is not documented
+        # as thread-safe); each reuses its connection across requests
+        self._local = threading.local()
+        
     def load_from_download(self, data_dir: Optional[str] = None) -> Tuple[nx.Graph, Dict[str, str]]:
         """
         Load PPI network from downloaded STRING files.
@@ -83,86 +147,210 @@ class STRINGLoader:
                 aliases_file = path
                 break
         
-        if aliases_file is None:
-            logger.warning("Aliases file not found. Will use STRING IDs directly.")
-            protein_aliases = {}
+        # A network parsed by an earlier run is reused while it is newer
+        # than the files it was parsed from
+        cache_sources = self._cache_sources(links_file, aliases_file)
+        cached = self._read_network_cache(cache_sources)
+        if cached is not None:
+            edges, protein_aliases = cached
         else:
-            # Load aliases
-            protein_aliases = self._load_aliases(aliases_file)
-        
-        logger.info(f"Loading STRING network from files (threshold={self.threshold})...")
-        logger.info(f"Using links file: {links_file}")
-        if aliases_file:
-            logger.info(f"Using aliases file: {aliases_file}")
+            if aliases_file is None:
+                logger.warning("Aliases file not found. Will use STRING IDs directly.")
+                protein_aliases = {}
+            else:
+                # Load aliases
+                protein_aliases = self._load_aliases(aliases_file)
+            
+            logger.info(f"Loading STRING network from files (threshold={self.threshold})...")
+            logger.info(f"Using links file: {links_file}")
+            if aliases_file:
+                logger.info(f"Using aliases file: {aliases_file}")
+            
+            # Load network
+            edges = self._load_edges(links_file, protein_aliases)
+            self._write_network_cache(edges, protein_aliases, cache_sources)
         
-        # Load network
-        graph = self._load_network(links_file, protein_aliases)
+        graph = _edges_to_graph(edges)
         
         logger.info(f"Loaded network: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
         return graph, protein_aliases
     
     def _load_aliases(self, aliases_file: str) -> Dict[str, str]:
         """Load protein aliases and map to UniProt IDs."""
-        aliases = {}
-        uniprot_mapping = {}
-        
         logger.info(f"Loading aliases from {aliases_file}...")
         
-        # Check if file is compressed
-        open_func = gzip.open if aliases_file.endswith('.gz') else open
-        mode = 'rt' if aliases_file.endswith('.gz') else 'r'
-        
-        with open_func(aliases_file, mode) as f:
-            next(f)  # Skip header
-            for line in f:
-                parts = line.strip().split('\t')
-                if len(parts) >= 3:
-                    string_id = parts[0]
-                    alias = parts[1]
-                    source = parts[2]
-                    
-                    # Prioritize UniProt IDs
-                    if source == "UniProt_AC" or source == "UniProt_ID":
-                        if string_id not in uniprot_mapping:
-                            uniprot_mapping[string_id] = alias
-                    
-                    aliases[string_id] = alias
+        # Tab-separated string_id, alias, source (compression inferred from
+        # the name); fields are kept verbatim, without quote or NA handling
+        reader = pd.read_csv(
+            aliases_file, sep='\t', header=None, skiprows=1, usecols=[0, 1, 2],
+            names=['string_id', 'alias', 'source'],
+            dtype={'string_id': str, 'alias': str, 'source': 'category'},
+            na_filter=False, quoting=csv.QUOTE_NONE, engine='c', chunksize=LINKS_CHUNK_ROWS
+        )
+        
+        # Prioritize UniProt IDs: the first UniProt alias of each protein wins
+        uniprot_rows = [chunk[chunk['source'].isin(UNIPROT_SOURCES)] for chunk in reader]
+        uniprot_mapping = {}
+        if uniprot_rows:
+            uniprot = pd.concat(uniprot_rows).drop_duplicates('string_id')
+            uniprot_mapping = dict(zip(uniprot['string_id'], uniprot['alias']))
         
         logger.info(f"Loaded {len(uniprot_mapping)} UniProt mappings")
         return uniprot_mapping
     
     def _load_network(self, links_file: str, protein_aliases: Dict[str, str]) -> nx.Graph:
         """Load PPI network from links file."""
-        graph = nx.Graph()
-        
+        return _edges_to_graph(self._load_edges(links_file, protein_aliases))
+    
+    def _load_edges(self, links_file: str, protein_aliases: Dict[str, str]) -> pd.DataFrame:
+        """Load the thresholded, de-duplicated edge list from links file."""
         logger.info(f"Loading network from {links_file}...")
         
-        # Check if file is compressed
-        open_func = gzip.open if links_file.endswith('.gz') else open
-        mode = 'rt' if links_file.endswith('.gz') else 'r'
-        
-        with open_func(links_file, mode) as f:
-            next(f)  # Skip header
-            edge_count = 0
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) >= 10:
-                    protein1 = parts[0]
-                    protein2 = parts[1]
-                    combined_score = int(parts[9])
-                    
-                    if combined_score >= self.threshold:
-                        # Use UniProt ID if available, otherwise STRING ID
-                        p1_id = protein_aliases.get(protein1, protein1)
-                        p2_id = protein_aliases.get(protein2, protein2)
-                        
-                        graph.add_edge(p1_id, p2_id, weight=combined_score / 1000.0)
-                        edge_count += 1
-                        
-                        if edge_count % 100000 == 0:
-                            logger.debug(f"Loaded {edge_count} edges...")
-        
-        return graph
+        # Only protein1, protein2 and combined_score (10th column) are parsed,
+        # by pandas' C parser in chunks (compression inferred from the name)
+        reader = pd.read_csv(
+            links_file, sep=r'\s+', header=None, skiprows=1, usecols=[0, 1, 9],
+            names=range(10), dtype={0: str, 1: str}, engine='c',
+            chunksize=LINKS_CHUNK_ROWS
+        )
+        node_codes = {}
+        sources, targets, weights = [], [], []
+        for chunk in reader:
+            # Rows with fewer than 10 columns have no combined score
+            chunk = chunk.dropna(subset=[9])
+            scores = chunk[9].to_numpy(dtype=np.int64)
+            keep = scores >= self.threshold
+            sources.append(_encode_proteins(chunk[0].to_numpy()[keep], protein_aliases, node_codes))
+            targets.append(_encode_proteins(chunk[1].to_numpy()[keep], protein_aliases, node_codes))
+            weights.append(scores[keep] / 1000.0)
+        
+        if not node_codes:
+            return pd.DataFrame({'source': pd.Series(dtype=object),
+                                 'target': pd.Series(dtype=object),
+                                 'weight': pd.Series(dtype=np.float64)})
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        weights = np.concatenate(weights)
+        logger.debug(f"Loaded {len(weights)} edges...")
+        
+        # STRING lists each interaction in both directions. Each node pair is
+        # added once, at its first row and with the weight of its last row,
+        # as repeated add_edge calls would leave it.
+        low = np.minimum(sources, targets)
+        pair_keys = low * len(node_codes) + (sources + targets - low)
+        order = np.argsort(pair_keys, kind='stable')
+        sorted_keys = pair_keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(sorted_keys)]
+        first_rows = order[starts]
+        last_rows = order[ends - 1]
+        by_position = np.argsort(first_rows)
+        rows = first_rows[by_position]
+        
+        # Use UniProt ID if available, otherwise STRING ID
+        names = np.array(list(node_codes), dtype=object)
+        return pd.DataFrame({'source': names[sources[rows]],
+                             'target': names[targets[rows]],
+                             'weight': weights[last_rows[by_position]]})
+    
+    def _network_cache_paths(self) -> Tuple[str, str]:
+        """Paths of the cached edge list and aliases for this taxid and threshold."""
+        prefix = os.path.join(self.cache_dir, f"{self.taxid}_{self.threshold}")
+        return f"{prefix}.parquet", f"{prefix}.aliases.parquet"
+    
+    def _cache_sources(self, links_file: str, aliases_file: Optional[str]) -> bytes:
+        """
+        Describe the inputs of a parsed network, to validate a cached copy.
+        
+        Args:
+            links_file: STRING links file
+            aliases_file: STRING aliases file, or None if aliases are not used
+            
+        Returns:
+            JSON with the taxid, threshold, and the absolute path, size and
+            mtime of each source file
+        """
+        def describe(path):
+            if path is None:
+                return None
+            stat = os.stat(path)
+            return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        
+        return json.dumps({
+            "taxid": self.taxid,
+            "threshold": self.threshold,
+            "links": describe(links_file),
+            "aliases": describe(aliases_file),
+        }, sort_keys=True).encode()
+    
+    def _read_network_cache(self, cache_sources: bytes) -> Optional[Tuple[pd.DataFrame, Dict[str, str]]]:
+        """
+        Read the edge list and aliases cached by an earlier load.
+        
+        Args:
+            cache_sources: Output of _cache_sources for the current inputs
+            
+        Returns:
+            (edges, protein_aliases), or None if there is no cache, it was
+            parsed from other inputs, or it cannot be read
+        """
+        if not PARQUET_AVAILABLE:
+            return None
+        
+        edges_path, aliases_path = self._network_cache_paths()
+        if not (os.path.exists(edges_path) and os.path.exists(aliases_path)):
+            return None
+        
+        try:
+            edges_table = pq.read_table(edges_path)
+            aliases_table = pq.read_table(aliases_path)
+        except (OSError, ValueError, pa.ArrowException) as e:
+            logger.warning(f"Could not read cached network {edges_path} ({e}); reloading")
+            return None
+        
+        # Both files must come from the same inputs as the current load
+        for table in (edges_table, aliases_table):
+            if (table.schema.metadata or {}).get(CACHE_SOURCES_KEY) != cache_sources:
+                logger.info(f"Cached network {edges_path} was parsed from other STRING files; reloading")
+                return None
+        
+        logger.info(f"Loading cached STRING network from {edges_path}...")
+        edges = edges_table.to_pandas()
+        aliases = aliases_table.to_pandas()
+        
+        # Node names are interned as when parsing the links file
+        for col in ('source', 'target'):
+            codes, uniques = pd.factorize(edges[col])
+            names = np.array([sys.intern(name) for name in uniques], dtype=object)
+            edges[col] = names[codes]
+        return edges, dict(zip(aliases['string_id'], aliases['alias']))
+    
+    def _write_network_cache(self, edges: pd.DataFrame, protein_aliases: Dict[str, str],
+                             cache_sources: bytes):
+        """
+        Cache the parsed edge list and aliases as Parquet for later loads.
+        
+        Args:
+            edges: Edge list with source, target and weight columns
+            protein_aliases: Dict mapping STRING IDs to UniProt IDs
+            cache_sources: Output of _cache_sources, stored in both files' metadata
+        """
+        if not PARQUET_AVAILABLE:
+            logger.debug("pyarrow not available; STRING network is not cached")
+            return
+        
+        edges_path, aliases_path = self._network_cache_paths()
+        aliases = pd.DataFrame({'string_id': list(protein_aliases),
+                                'alias': list(protein_aliases.values())}, dtype=object)
+        try:
+            for df, path in ((aliases, aliases_path), (edges, edges_path)):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                table = table.replace_schema_metadata(
+                    {**(table.schema.metadata or {}), CACHE_SOURCES_KEY: cache_sources}
+                )
+                pq.write_table(table, path, compression='zstd')
+        except OSError as e:
+            logger.warning(f"Could not cache STRING network to {edges_path}: {e}")
     
     def load_from_api(self, protein_list: Optional[list] = None) -> Tuple[nx.Graph, Dict[str, str]]:
         """
@@ -188,28 +376,54 @@ class STRINGLoader:
             # This is a simplified version - full implementation would fetch all proteins
             raise NotImplementedError("Full API implementation requires pagination")
         
-        # Get interactions
-        url = f"{self.STRING_BASE_URL}/json/network"
-        params = {
-            "identifiers": "%0d".join(protein_list[:100]),  # API limit
-            "species": self.taxid,
-            "required_score": self.threshold
-        }
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        # Get interactions. The network endpoint only returns interactions
+        # among the identifiers of a request, so one request is sent per pair
+        # of API_CHUNK_SIZE chunks (including each chunk with itself) to cover
+        # every protein pair; requests run concurrently.
+        chunks = [protein_list[i:i + API_CHUNK_SIZE]
+                  for i in range(0, len(protein_list), API_CHUNK_SIZE)]
+        request_ids = [chunks[a] if a == b else chunks[a] + chunks[b]
+                       for a, b in combinations_with_replacement(range(len(chunks)), 2)]
+        with ThreadPoolExecutor(max_workers=API_MAX_WORKERS) as executor:
+            results = list(executor.map(self._fetch_network, request_ids))
         
         graph = nx.Graph()
         protein_aliases = {}
         
-        for interaction in data:
-            p1 = interaction['preferredName_A']
-            p2 = interaction['preferredName_B']
-            score = interaction.get('score', 0)
-            
-            if score * 1000 >= self.threshold:
-                graph.add_edge(p1, p2, weight=score)
+        # A pair appears in every request holding both chunks; add_edge keeps
+        # one edge with the same score
+        for data in results:
+            for interaction in data:
+                p1 = interaction['preferredName_A']
+                p2 = interaction['preferredName_B']
+                score = interaction.get('score', 0)
+                
+                if score * 1000 >= self.threshold:
+                    graph.add_edge(p1, p2, weight=score)
         
         return graph, protein_aliases
-
+    
+    def _fetch_network(self, identifiers: list) -> list:
+        """
+        Fetch the STRING API interactions among a list of identifiers.
+        
+        Args:
+            identifiers: Protein identifiers (at most 2 * API_CHUNK_SIZE)
+            
+        Returns:
+            List of interaction records
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        
+        url = f"{self.STRING_BASE_URL}/json/network"
+        data = {
+            "identifiers": "\r".join(identifiers),
+            "species": self.taxid,
+            "required_score": self.threshold
+        }
+        
+        response = session.post(url, data=data)
+        response.raise_for_status()
+        return response.json()
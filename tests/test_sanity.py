@@ -6,11 +6,28 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import math
+import random
 import networkx as nx
+import numpy as np
+import pytest
+from src.go_loader import GOLoader
 from src.mcl_clustering import MCLClustering
 from src.go_tfidf import GOTFIDF
-from src.permanence import calculate_permanence_all_proteins
-from src.evaluation import evaluate_clusters
+from src.permanence import (
+    calculate_permanence, calculate_permanence_all_proteins, _pack_permanence_inputs,
+    _permanence_kernel, _permanence_loop, _permanence_numpy
+)
+from src.membership_overlap import (
+    apply_overlap_reassignment, find_emax_cluster, precompute_emax, _membership_gains_loop,
+    _no_candidates_without_fd, _no_candidates_without_fd_loop, _overlap_candidates_kernel,
+    _overlap_candidates_loop, _overlap_candidates_numpy
+)
+from src.outputs import (
+    _write_csv, save_go_term_importance, save_initial_clusters, save_optimized_clusters,
+    save_overlap_summary, save_protein_membership
+)
+from src.evaluation import evaluate_clusters, evaluate_clusters_df
 
 def test_toy_graph():
     """Test pipeline components on a small toy graph."""
@@ -62,13 +79,284 @@ def test_toy_graph():
     
     # Test evaluation
     print("\nTesting evaluation...")
-    eval_df = evaluate_clusters(clusters, graph, protein_go_terms, go_tfidf)
+    metrics = evaluate_clusters(clusters, graph, protein_go_terms, go_tfidf)
+    assert isinstance(metrics, dict)
+    eval_df = evaluate_clusters_df(clusters, graph, protein_go_terms, go_tfidf)
+    assert list(eval_df.columns) == list(metrics.keys())
     print("Evaluation metrics:")
     print(eval_df.to_string())
     
     print("\n✓ All tests passed!")
 
 
+def test_go_tfidf_scores():
+    """TF-IDF (Eq.3) matches tf/|c| * log(N/df) for each cluster and term."""
+    clusters = {0: {'A', 'B'}, 1: {'C'}, 2: {'D', 'E'}}
+    protein_go_terms = {
+        'A': {'GO:1', 'GO:2'},
+        'B': {'GO:1'},
+        'C': {'GO:1', 'GO:3'},
+        'E': set(),
+    }
+    go_tfidf = GOTFIDF(clusters, protein_go_terms)
+    
+    assert go_tfidf.get_tfidf(0, 'GO:1') == pytest.approx(1.0 * math.log(3 / 2))
+    assert go_tfidf.get_tfidf(0, 'GO:2') == pytest.approx(0.5 * math.log(3))
+    assert go_tfidf.get_tfidf(1, 'GO:3') == pytest.approx(math.log(3))
+    assert go_tfidf.get_tfidf(0, 'GO:3') == 0.0
+    assert go_tfidf.get_tfidf(5, 'GO:1') == 0.0
+    
+    # Clusters without annotated proteins have no scores
+    assert set(go_tfidf.get_all_scores()) == {0, 1}
+    assert go_tfidf.get_top_terms(2) == []
+    assert [t for t, _ in go_tfidf.get_top_terms(0)] == ['GO:2', 'GO:1']
+
+
+def test_gaf_extra_fields(tmp_path):
+    """GAF rows with a trailing tab or an 18th field load like 17-field rows."""
+    def gaf_row(protein, go_term, extra=()):
+        fields = ['UniProtKB', protein, protein, '', go_term] + [''] * 7 + ['taxon:4932']
+        return '\t'.join(fields + [''] * 4 + list(extra))
+    
+    gaf_file = tmp_path / 'test.gaf'
+    gaf_file.write_text('\n'.join([
+        '!gaf-version: 2.2',
+        gaf_row('P1', 'GO:0000001', ['extra']),
+        gaf_row('P2', 'GO:0000002') + '\t',
+        gaf_row('P1', 'GO:0000003'),
+        'UniProtKB\tP3\tP3\t\tGO:0000004',
+    ]) + '\n')
+    
+    protein_go_terms = GOLoader(cache_dir=str(tmp_path)).load_from_gaf(str(gaf_file))
+    assert protein_go_terms == {
+        'P1': {'GO:0000001', 'GO:0000003'},
+        'P2': {'GO:0000002'},
+        'P3': {'GO:0000004'},
+    }
+    
+    # A file whose lines all have fewer than 17 fields (GAF 1.0 has 15)
+    short_file = tmp_path / 'short.gaf'
+    short_file.write_text('UniProtKB\tP4\tP4\t\tGO:0000005\n')
+    assert GOLoader(cache_dir=str(tmp_path)).load_from_gaf(str(short_file)) == {
+        'P4': {'GO:0000005'}
+    }
+
+
+def _random_ppi(seed, n_nodes=60, n_edges=200, n_clusters=12):
+    """
+    Random graph with self-loops, overlapping clusters and GO terms.
+    
+    Cluster 100 duplicates cluster 3 and cluster 5 has proteins missing
+    from the graph.
+    """
+    rng = random.Random(seed)
+    graph = nx.relabel_nodes(nx.gnm_random_graph(n_nodes, n_edges, seed=seed),
+                             lambda i: f'P{i}')
+    for i in rng.sample(range(n_nodes), 5):
+        graph.add_edge(f'P{i}', f'P{i}')
+    
+    nodes = sorted(graph.nodes())
+    clusters = {cid: set(rng.sample(nodes, rng.randint(2, 10))) for cid in range(n_clusters)}
+    clusters[100] = set(clusters[3])
+    clusters[5] |= {'MISSING1', 'MISSING2'}
+    
+    protein_go_terms = {p: {f'GO:{rng.randrange(25):07d}' for _ in range(rng.randint(1, 4))}
+                        for p in nodes if rng.random() < 0.8}
+    return graph, clusters, protein_go_terms
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_precompute_emax(seed):
+    """precompute_emax gives find_emax_cluster's answer for every protein."""
+    graph, clusters, _ = _random_ppi(seed)
+    
+    emax = precompute_emax(clusters, graph)
+    for cluster in clusters.values():
+        for protein in cluster:
+            assert emax[protein] == find_emax_cluster(protein, clusters, graph)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_permanence_paths(seed):
+    """Per-protein, numba, NumPy and multi-process permanence all agree."""
+    graph, clusters, _ = _random_ppi(seed)
+    
+    scores = calculate_permanence_all_proteins(clusters, graph)
+    for cluster_id, cluster in clusters.items():
+        for protein in cluster:
+            expected = calculate_permanence(protein, cluster, graph, clusters)
+            assert scores.score(protein, cluster_id) == pytest.approx(expected)
+    
+    protein_clusters = {}
+    for cluster_id, cluster in clusters.items():
+        for protein in cluster:
+            protein_clusters.setdefault(protein, []).append(cluster_id)
+    packed_inputs = _pack_permanence_inputs(clusters, graph, protein_clusters)
+    expected = _permanence_numpy(*packed_inputs)
+    np.testing.assert_allclose(_permanence_loop(*packed_inputs), expected)
+    np.testing.assert_allclose(_permanence_kernel(*packed_inputs), expected)
+    
+    assert dict(calculate_permanence_all_proteins(clusters, graph, n_workers=2)) == dict(scores)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('alpha,overlap_tau', [(0.5, 0.0), (0.3, -0.2), (1.0, 0.0), (0.0, 0.1)])
+def test_overlap_paths(seed, alpha, overlap_tau):
+    """Numba, NumPy and multi-process overlap candidates all agree."""
+    graph, clusters, protein_go_terms = _random_ppi(seed)
+    go_tfidf = GOTFIDF(clusters, protein_go_terms)
+    permanence_scores = calculate_permanence_all_proteins(clusters, graph)
+    
+    # The packed kernel inputs are taken from the cache of a real call
+    membership_cache = {}
+    result = apply_overlap_reassignment(clusters, graph, protein_go_terms, go_tfidf,
+                                        permanence_scores, alpha, overlap_tau,
+                                        membership_cache=membership_cache)
+    packed_inputs = membership_cache['inputs'][-1]
+    
+    offsets, positions, gains = _overlap_candidates_numpy(*packed_inputs, alpha, overlap_tau)
+    for kernel in (_overlap_candidates_loop, _overlap_candidates_kernel):
+        k_offsets, k_positions, k_gains = kernel(*packed_inputs, alpha, overlap_tau)
+        np.testing.assert_array_equal(k_offsets, offsets)
+        np.testing.assert_array_equal(k_positions, positions)
+        np.testing.assert_allclose(k_gains, gains)
+    
+    # Proteins skipped without FD scores have no gain above overlap_tau
+    (perm_indptr, perm_pos, perm_vals, fd_rows, fd_indptr, fd_cols, fd_vals,
+     fd_col_pos, cur_indptr, cur_pos, n_clusters) = packed_inputs
+    for i in range(len(fd_rows)):
+        args = (i, perm_indptr, perm_pos, perm_vals, fd_rows, fd_indptr,
+                cur_indptr, cur_pos, alpha, overlap_tau)
+        skipped = _no_candidates_without_fd_loop(*args)
+        assert _no_candidates_without_fd(*args) == skipped
+        if skipped:
+            protein_gains = _membership_gains_loop(i, perm_indptr, perm_pos, perm_vals, fd_rows,
+                                                   fd_indptr, fd_cols, fd_vals, fd_col_pos,
+                                                   cur_indptr, cur_pos, n_clusters, alpha)
+            assert not (protein_gains > overlap_tau).any()
+    
+    assert apply_overlap_reassignment(clusters, graph, protein_go_terms, go_tfidf,
+                                      permanence_scores, alpha, overlap_tau,
+                                      n_workers=2) == result
+
+
+def _baseline_overlap_reassignment(clusters, graph, protein_go_terms, go_tfidf,
+                                   permanence_scores, alpha, overlap_tau):
+    """
+    Reference: the original apply_overlap_reassignment loop.
+    
+    The original membership, link and E_max helpers are inlined so the
+    reference does not share code with the rewritten function.
+    """
+    def membership(protein, cluster_id):
+        a = max(0.0, min(1.0, alpha))
+        perm_norm = permanence_scores.get(protein, {}).get(cluster_id, 0.0)
+        fd_norm = 0.0
+        protein_terms = protein_go_terms.get(protein)
+        if protein_terms:
+            fd_score = sum(go_tfidf.get_tfidf(cluster_id, t) for t in protein_terms)
+            fd_norm = max(-1.0, min(1.0, math.tanh(fd_score / len(protein_terms))))
+        return max(-1.0, min(1.0, a * perm_norm + (1 - a) * fd_norm))
+    
+    def links(protein, cluster):
+        if protein not in graph:
+            return (0, 0)
+        neighbors = set(graph.neighbors(protein))
+        return (len(neighbors & cluster), len(neighbors - cluster))
+    
+    def emax_cluster(protein, clusters):
+        if protein not in graph:
+            return -1
+        neighbors = set(graph.neighbors(protein))
+        max_connections = 0
+        emax_cluster_id = -1
+        for cluster_id, cluster in clusters.items():
+            if protein in cluster:
+                continue
+            connections = len(neighbors & cluster)
+            if connections > max_connections:
+                max_connections = connections
+                emax_cluster_id = cluster_id
+        return emax_cluster_id
+    
+    updated_clusters = {cid: proteins.copy() for cid, proteins in clusters.items()}
+    all_proteins = set()
+    for cluster in clusters.values():
+        all_proteins.update(cluster)
+    
+    for protein in all_proteins:
+        current_clusters = [cid for cid, cluster in updated_clusters.items()
+                            if protein in cluster]
+        if not current_clusters:
+            continue
+        current_memberships = {cid: membership(protein, cid) for cid in current_clusters}
+        
+        for cluster_id, cluster in updated_clusters.items():
+            if cluster_id in current_clusters:
+                continue
+            membership_gain = membership(protein, cluster_id) - max(current_memberships.values())
+            if membership_gain > overlap_tau:
+                updated_clusters[cluster_id].add(protein)
+        
+        for cid in current_clusters:
+            intra_links, extra_links = links(protein, updated_clusters[cid])
+            if extra_links > intra_links:
+                emax_cid = emax_cluster(protein, updated_clusters)
+                if emax_cid != -1 and emax_cid != cid:
+                    emax_intra, _ = links(protein, updated_clusters[emax_cid])
+                    if emax_intra > intra_links:
+                        updated_clusters[cid].discard(protein)
+                        updated_clusters[emax_cid].add(protein)
+    
+    return updated_clusters
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('alpha,overlap_tau', [(0.5, 0.1), (0.3, -0.2), (1.0, 0.0), (0.0, 0.05)])
+def test_overlap_reassignment_matches_baseline(seed, alpha, overlap_tau):
+    """apply_overlap_reassignment matches the original loop, overlaps and transfers included."""
+    graph, clusters, protein_go_terms = _random_ppi(seed)
+    go_tfidf = GOTFIDF(clusters, protein_go_terms)
+    permanence_scores = calculate_permanence_all_proteins(clusters, graph)
+    
+    expected = _baseline_overlap_reassignment(clusters, graph, protein_go_terms, go_tfidf,
+                                              permanence_scores, alpha, overlap_tau)
+    assert apply_overlap_reassignment(clusters, graph, protein_go_terms, go_tfidf,
+                                      permanence_scores, alpha, overlap_tau) == expected
+
+
+def test_fast_writers(tmp_path):
+    """The raw CSV writer and every save_* function match DataFrame.to_csv."""
+    columns = {
+        'id': np.array(['P1', 'a,b', 'say "hi"', 'x\ny', ''], dtype=object),
+        'count': np.array([0, -3, 7, 12, 2**40], dtype=np.int64),
+        'score': np.array([0.1, -2.5e-9, np.nan, 1e20, 1 / 3]),
+        'flag': np.array([True, False, True, True, False])
+    }
+    graph, clusters, protein_go_terms = _random_ppi(1)
+    clusters[6].add('Q"1,x')
+    go_tfidf = GOTFIDF(clusters, protein_go_terms)
+    permanence_scores = calculate_permanence_all_proteins(clusters, graph)
+    
+    writers = {
+        'columns': lambda path, fast: _write_csv(path, columns, fast),
+        'initial': lambda path, fast: save_initial_clusters(clusters, path, fast=fast),
+        'go_terms': lambda path, fast: save_go_term_importance(go_tfidf, path, fast=fast),
+        'membership': lambda path, fast: save_protein_membership(
+            clusters, graph, protein_go_terms, go_tfidf, permanence_scores, 0.5, path, fast=fast
+        ),
+        'optimized': lambda path, fast: save_optimized_clusters(
+            clusters, permanence_scores, protein_go_terms, go_tfidf, graph, 0.5, path, fast=fast
+        ),
+        'overlap': lambda path, fast: save_overlap_summary(clusters, path, fast=fast)
+    }
+    for name, write in writers.items():
+        write(str(tmp_path / f'{name}_fast.csv'), True)
+        write(str(tmp_path / f'{name}_slow.csv'), False)
+        fast_bytes = (tmp_path / f'{name}_fast.csv').read_bytes()
+        assert fast_bytes == (tmp_path / f'{name}_slow.csv').read_bytes(), name
+
+
 if __name__ == '__main__':
     test_toy_graph()
 